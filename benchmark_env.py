@@ -0,0 +1,185 @@
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+import numpy as np
+from src.environment.pokemon_env import PokemonYellowEnv
+
+# --- CONFIGURATION ---
+ROM_PATH = "roms/PokemonYellow.gb"
+NUM_RESETS = 20
+NUM_STEPS = 2000
+ALLOC_STEPS = 200 # Steps traced with tracemalloc (slow, kept short)
+
+# Observation configurations to compare (PokemonYellowEnv kwargs)
+OBS_CONFIGS = {
+    'rgb_144x160': {},
+    'gray_72x80': {'screen_resolution': (72, 80), 'grayscale': True},
+    'gray_36x40_stack4': {'screen_resolution': (36, 40), 'grayscale': True, 'frame_stack': 4},
+    'rgb_144x160_every4': {'screen_interval': 4},
+    'ram_symbolic': {'observation_type': 'ram'},
+}
+
+def make_env(backend, **kwargs):
+    return PokemonYellowEnv(ROM_PATH, render_mode='rgb_array', backend=backend, profile_interval=0, **kwargs)
+
+def fixed_actions(n_actions, num_steps, n_envs=None):
+    # Same action sequence on every run, so results are comparable
+    shape = (num_steps,) if n_envs is None else (num_steps, n_envs)
+    return np.random.default_rng(0).integers(n_actions, size=shape)
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux; children covers vectorized workers
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024.0, children / 1024.0
+
+def bench_reset(backend, fast_reset, num_resets=NUM_RESETS):
+    """Returns reset latency stats in milliseconds for one env."""
+    env = make_env(backend, fast_reset=fast_reset)
+    env.reset() # Warm-up (also fills the savestate cache)
+
+    timings = []
+    for _ in range(num_resets):
+        t0 = time.perf_counter()
+        env.reset()
+        timings.append(time.perf_counter() - t0)
+    env.close()
+    timings = np.array(timings) * 1000.0
+    return {'mean_ms': float(timings.mean()),
+            'p50_ms': float(np.percentile(timings, 50)),
+            'p95_ms': float(np.percentile(timings, 95))}
+
+def bench_single(backend, num_steps=NUM_STEPS, emulation_profile='fast', **env_kwargs):
+    """Steps/sec, frames/sec and per-step transient allocations of one env."""
+    env = make_env(backend, emulation_profile=emulation_profile, **env_kwargs)
+    env.reset()
+    actions = fixed_actions(env.action_space.n, num_steps)
+
+    t0 = time.perf_counter()
+    for action in actions:
+        _, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            env.reset()
+    elapsed = time.perf_counter() - t0
+
+    # Peak traced memory above the baseline during one step = bytes allocated and freed by it
+    tracemalloc.start()
+    allocs = []
+    for action in actions[:ALLOC_STEPS]:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        env.step(action)
+        allocs.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    env.close()
+
+    return {'steps_per_sec': num_steps / elapsed,
+            'frames_per_sec': num_steps * env.frames_per_action / elapsed,
+            'alloc_bytes_per_step': float(np.mean(allocs))}
+
+def bench_vec(backend, vec, n_envs, num_steps=NUM_STEPS, envs_per_worker=1, **env_kwargs):
+    """Steps/sec (summed over envs) of a vectorized env."""
+    from stable_baselines3.common.env_util import make_vec_env
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+    from src.environment.shared_vec_env import SharedMemoryVecEnv
+
+    env_fn = lambda: make_env(backend, **env_kwargs)
+    if vec == 'shared':
+        venv = make_vec_env(env_fn, n_envs=n_envs, vec_env_cls=SharedMemoryVecEnv,
+                            vec_env_kwargs={'envs_per_worker': envs_per_worker})
+    else:
+        venv = make_vec_env(env_fn, n_envs=n_envs, vec_env_cls=SubprocVecEnv)
+    venv.reset()
+    actions = fixed_actions(venv.action_space.n, num_steps // n_envs, n_envs)
+
+    t0 = time.perf_counter()
+    for step_actions in actions:
+        venv.step(step_actions)
+    elapsed = time.perf_counter() - t0
+    venv.close()
+    return {'steps_per_sec': len(actions) * n_envs / elapsed}
+
+def compare(results, baseline, tolerance):
+    """Returns the list of regressions against a stored baseline."""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            if old is None: continue
+            higher_is_better = metric.endswith('_per_sec')
+            worse = value < old * (1 - tolerance) if higher_is_better else value > old * (1 + tolerance)
+            # Allocation counts are noisy at small sizes, ignore sub-KB changes
+            if worse and not (metric.startswith('alloc') and abs(value - old) < 1024):
+                regressions.append(f"{name}.{metric}: {old:.2f} -> {value:.2f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="PokemonYellowEnv throughput benchmarks")
+    parser.add_argument('--backend', choices=['pyboy', 'fake'], default='pyboy',
+                        help="'fake' runs without the ROM (deterministic stand-in emulator)")
+    parser.add_argument('--obs', default=','.join(OBS_CONFIGS), help="Comma-separated OBS_CONFIGS names")
+    parser.add_argument('--env-counts', default='', help="Comma-separated env counts for vectorized runs, e.g. 4,8")
+    parser.add_argument('--vec', choices=['shared', 'subproc'], default='shared')
+    parser.add_argument('--envs-per-worker', type=int, default=1)
+    parser.add_argument('--steps', type=int, default=NUM_STEPS)
+    parser.add_argument('--output', help="Write results to this JSON file")
+    parser.add_argument('--baseline', help="Compare against a previous --output file")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"--- ENV BENCHMARK ({args.backend}) ---")
+
+    for fast_reset in (False, True):
+        name = f"reset/{'fast' if fast_reset else 'legacy'}"
+        results[name] = bench_reset(args.backend, fast_reset)
+        print(f"{name:<32} mean={results[name]['mean_ms']:8.2f} ms | p95={results[name]['p95_ms']:8.2f} ms")
+
+    for profile in ('legacy', 'fast'):
+        name = f"single/profile_{profile}"
+        results[name] = bench_single(args.backend, args.steps, emulation_profile=profile)
+        print(f"{name:<32} {results[name]['steps_per_sec']:8.1f} steps/s | {results[name]['frames_per_sec']:9.0f} frames/s")
+
+    for obs_name in args.obs.split(','):
+        name = f"single/{obs_name}"
+        results[name] = bench_single(args.backend, args.steps, **OBS_CONFIGS[obs_name])
+        print(f"{name:<32} {results[name]['steps_per_sec']:8.1f} steps/s | "
+              f"{results[name]['alloc_bytes_per_step'] / 1024:8.1f} KB allocated/step")
+
+    for n_envs in [int(n) for n in args.env_counts.split(',') if n]:
+        for obs_name in args.obs.split(','):
+            name = f"vec_{args.vec}/{n_envs}/{obs_name}"
+            results[name] = bench_vec(args.backend, args.vec, n_envs, args.steps,
+                                      args.envs_per_worker, **OBS_CONFIGS[obs_name])
+            print(f"{name:<32} {results[name]['steps_per_sec']:8.1f} steps/s")
+
+    own_rss, children_rss = peak_rss_mb()
+    print(f"Peak RSS: {own_rss:.0f} MB (main) | {children_rss:.0f} MB (largest worker)")
+    report = {
+        'meta': {'backend': args.backend, 'steps': args.steps, 'python': platform.python_version(),
+                 'machine': platform.machine(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'peak_rss_mb': {'main': own_rss, 'worker': children_rss},
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Resultados guardados en: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"❌ Regression {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
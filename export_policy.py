@@ -0,0 +1,31 @@
+import argparse
+import os
+from src.inference.export import check_export, export_policy
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a RecurrentPPO checkpoint to TorchScript for CPU inference")
+    parser.add_argument('model', help="Checkpoint zip (e.g. experiments/poke_lstm_v1/models/lstm_model_optimized_*.zip)")
+    parser.add_argument('--output', help="Output .pt file (default: next to the checkpoint)")
+    parser.add_argument('--no-freeze', action='store_true', help="Keep parameters as module attributes")
+    parser.add_argument('--skip-check', action='store_true', help="Do not compare against SB3")
+    parser.add_argument('--check-steps', type=int, default=64, help="Steps per batch size in the check")
+    parser.add_argument('--batch-sizes', default="1,8", help="Batch sizes checked and timed")
+    args = parser.parse_args()
+
+    output = args.output or f"{os.path.splitext(args.model)[0]}.pt"
+    model = export_policy(args.model, output, freeze=not args.no_freeze)
+    print(f"✅ Política exportada: {output} ({os.path.getsize(output) / 1e6:.1f} MB)")
+    if args.skip_check: return
+
+    results = check_export(model, output, batch_sizes=[int(b) for b in args.batch_sizes.split(',')],
+                           steps=args.check_steps)
+    for result in results:
+        icon = "✅" if result['ok'] else "❌"
+        print(f"{icon} batch {result['batch_size']}: diff máx {result['max_abs_diff']:.2e} | "
+              f"acciones iguales {100 * result['action_agreement']:.1f}% | "
+              f"SB3 {result['sb3_ms']:.2f} ms vs exportada {result['exported_ms']:.2f} ms por paso")
+    if not all(result['ok'] for result in results):
+        raise SystemExit("❌ La política exportada no coincide con SB3")
+
+if __name__ == "__main__":
+    main()
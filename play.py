@@ -1,17 +1,30 @@
+import json
+import math
 import os
-import glob
+import threading
 import time
 import cv2
 import numpy as np
-from sb3_contrib import RecurrentPPO
 from src.environment.pokemon_env import PokemonYellowEnv
+from src.inference.runner import PolicyRunner
 
 # --- CONFIGURATION ---
 MODEL_DIR = "experiments/poke_lstm_v1/models"
 ROM_PATH = "roms/PokemonYellow.gb"
 SCALE = 3
 FPS = 60  # Target real speed
-FRAMES_PER_ACTION = 24 # 🔥 MUST MATCH with .tick() in your pokemon_env.py
+FRAMES_PER_ACTION = 24 # 🔥 MUST MATCH frames_per_action used in train_lstm.py
+# 🔥 MUST MATCH the screen pipeline in train_lstm.py
+SCREEN_RESOLUTION = (144, 160)
+GRAYSCALE = False
+FRAME_STACK = 1
+OBSERVATION_TYPE = "multi"
+# Viewer grid: N agents side by side, one batched policy call per decision for all of them
+NUM_ENVS = 1
+GRID_SCALE = 2 # Per-tile scale when NUM_ENVS > 1
+MODEL_POLL_INTERVAL = 5.0 # Seconds between checkpoint directory scans (background thread)
+# .pt from export_policy.py: TorchScript runner instead of SB3 (faster start, no checkpoint watching)
+EXPORTED_POLICY = None
 
 # --- GAMEBOY AESTHETICS ---
 GB_CASE = (180, 180, 180)    
@@ -30,10 +43,54 @@ BTN_A_CENTER = (240, 120)
 BTN_B_CENTER = (190, 150)
 BTN_RADIUS = 25
 
-def get_latest_model():
-    list_of_files = glob.glob(f'{MODEL_DIR}/*.zip')
-    if not list_of_files: return None
-    return max(list_of_files, key=os.path.getctime)
+class ModelWatcher(threading.Thread):
+    """
+    Polls MODEL_DIR off the render loop and loads the newest checkpoint in the background.
+    `latest()` returns the most recent (path, model) pair; the swap is a single reference
+    assignment, so the viewer never waits on disk or unpickling.
+    """
+    def __init__(self, model_dir, poll_interval=MODEL_POLL_INTERVAL):
+        super().__init__(daemon=True)
+        self.model_dir = model_dir
+        self.poll_interval = poll_interval
+        self.current = (None, None)
+        self.stop_event = threading.Event()
+
+    def latest(self):
+        return self.current
+
+    def _newest_checkpoint(self):
+        # The trainer's latest.json names the newest checkpoint: one small read per poll
+        try:
+            with open(os.path.join(self.model_dir, 'latest.json')) as f:
+                latest = json.load(f)['latest']
+            if latest and os.path.exists(latest['path']):
+                return latest['path']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+        try:
+            entries = [entry for entry in os.scandir(self.model_dir) if entry.name.endswith('.zip')]
+        except FileNotFoundError:
+            return None
+        if not entries: return None
+        return max(entries, key=lambda entry: entry.stat().st_mtime).path
+
+    def run(self):
+        from sb3_contrib import RecurrentPPO # Only needed when watching checkpoints
+        while not self.stop_event.is_set():
+            path = self._newest_checkpoint()
+            if path and path != self.current[0]:
+                try:
+                    model = RecurrentPPO.load(path, device='cpu')
+                    self.current = (path, model)
+                    print(f"[UPDATE] Cargado: {os.path.basename(path)}")
+                except Exception as e:
+                    # Checkpoint still being written: retry on the next poll
+                    print(f"⚠️ No se pudo cargar {os.path.basename(path)}: {e}")
+            self.stop_event.wait(self.poll_interval)
+
+    def stop(self):
+        self.stop_event.set()
 
 # --- DRAWING FUNCTIONS ---
 def draw_gb_button_circle(panel, center, radius, base_color, light_color, text, is_pressed):
@@ -69,75 +126,106 @@ def draw_gamepad_panel(pressed_btn_idx, height, is_lstm=False):
     draw_gb_button_circle(panel, BTN_B_CENTER, BTN_RADIUS, GB_BTN_PURPLE, GB_BTN_PURPLE_L, "B", pressed_btn_idx == 5)
     return panel
 
+def stack_obs(observations):
+    # One (N, ...) array per observation key, for a single batched predict
+    return {key: np.stack([obs[key] for obs in observations]) for key in observations[0]}
+
+def draw_grid(envs, actions, cols, scale):
+    tiles = []
+    for i, env in enumerate(envs):
+        game_bgr = cv2.cvtColor(env.pyboy.screen.ndarray, cv2.COLOR_RGBA2BGR)
+        h, w, _ = game_bgr.shape
+        tile = cv2.resize(game_bgr, (w * scale, h * scale), interpolation=cv2.INTER_NEAREST)
+        label = f"#{i} {env.valid_actions[actions[i]]}"
+        cv2.putText(tile, label, (6, 18), cv2.FONT_HERSHEY_SIMPLEX, 0.5, COLOR_ON_NEON, 1)
+        tiles.append(tile)
+    while len(tiles) % cols:
+        tiles.append(np.zeros_like(tiles[0]))
+    rows = [np.hstack(tiles[r:r + cols]) for r in range(0, len(tiles), cols)]
+    return np.vstack(rows)
+
 def main():
     print("--- STREAM GAME BOY VISUALIZER (SMOOTH CINEMA MODE) ---")
     
     # Render_mode='rgb_array' so PyBoy doesn't open its window, only we do
-    env = PokemonYellowEnv(ROM_PATH, render_mode="rgb_array") 
-    
+    envs = [PokemonYellowEnv(ROM_PATH, render_mode="rgb_array",
+                             screen_resolution=SCREEN_RESOLUTION, grayscale=GRAYSCALE, frame_stack=FRAME_STACK,
+                             observation_type=OBSERVATION_TYPE, frames_per_action=FRAMES_PER_ACTION)
+            for _ in range(NUM_ENVS)]
+    grid_cols = math.ceil(math.sqrt(NUM_ENVS))
+    frames_per_action = envs[0].frames_per_action
+
+    runner = PolicyRunner(EXPORTED_POLICY, num_envs=NUM_ENVS) if EXPORTED_POLICY else None
+    watcher = ModelWatcher(MODEL_DIR)
+    if runner is None: watcher.start()
     current_model_path = None
     model = None
     lstm_states = None 
-    episode_starts = np.ones((1,), dtype=bool)
+    episode_starts = np.ones((NUM_ENVS,), dtype=bool)
+    step_count = 0 # Agent decisions shown, summed over every env in the grid
     
     # Initial Obs
-    obs, _ = env.reset()
+    observations = [env.reset()[0] for env in envs]
 
     try:
         while True:
-            # 1. SEARCH FOR NEW BRAIN
-            latest_model_path = get_latest_model()
-            if not latest_model_path:
+            # 1. NEW BRAIN? (loaded by the watcher thread, swapped here between decisions)
+            latest_model_path, latest_model = (EXPORTED_POLICY, runner) if runner else watcher.latest()
+            if latest_model is None:
                 print("Esperando primer modelo...", end="\r")
-                time.sleep(2)
+                if cv2.waitKey(200) & 0xFF == ord('q'):
+                    raise KeyboardInterrupt
                 continue
                 
             if latest_model_path != current_model_path:
-                print(f"[UPDATE] Cargando: {os.path.basename(latest_model_path)}")
-                # Reset visual environment when loading new model to see from start
-                obs, _ = env.reset()
-                model = RecurrentPPO.load(latest_model_path, env=env)
+                if current_model_path is not None:
+                    print(f"🔄 {os.path.basename(latest_model_path)} tras {step_count} pasos")
+                # Reset visual environments when loading new model to see from start
+                observations = [env.reset()[0] for env in envs]
+                model = latest_model
                 current_model_path = latest_model_path
                 lstm_states = None
-                episode_starts = np.ones((1,), dtype=bool)
+                episode_starts = np.ones((NUM_ENVS,), dtype=bool)
             
-            # 2. AI THINKS (1 time every 24 frames)
-            if model:
-                action_idx, lstm_states = model.predict(
-                    obs, 
+            # 2. AI THINKS (1 time every 24 frames, one forward pass for every env)
+            if runner is not None:
+                # LSTM state lives in the runner's preallocated tensors
+                actions = runner.predict(stack_obs(observations), episode_start=episode_starts, deterministic=False)
+            else:
+                actions, lstm_states = model.predict(
+                    stack_obs(observations), 
                     state=lstm_states, 
                     episode_start=episode_starts,
                     deterministic=False
                 )
-            else:
-                action_idx = env.action_space.sample()
 
             # 3. SMOOTH EXECUTION (Unroll the temporal loop)
             # Instead of env.step() that skips 24 frames, we do it manually step by step
             
             # Convert index to button name (e.g. 4 -> 'a')
-            action_name = env.valid_actions[action_idx]
+            action_names = [env.valid_actions[action] for env, action in zip(envs, actions)]
             frames_to_hold = 12            
             # 🔥 SMOOTH RENDERING LOOP (fill the gaps)
-            for i in range(FRAMES_PER_ACTION):
+            for i in range(frames_per_action):
                 frame_start = time.time()
                 
-                if i < frames_to_hold:
-                    env.pyboy.button(action_name)
-                
-                # Advance ONLY 1 frame
-                env.pyboy.tick(1) 
+                for env, action_name in zip(envs, action_names):
+                    if i < frames_to_hold:
+                        env.pyboy.button(action_name)
+                    # Advance ONLY 1 frame
+                    env.pyboy.tick(1) 
                 
                 # --- DRAW ---
-                game_pixels = env.pyboy.screen.ndarray # PyBoy 2.0
-                if game_pixels.shape[2] == 4: game_pixels = game_pixels[:, :, :3]
-                game_bgr = cv2.cvtColor(game_pixels, cv2.COLOR_RGB2BGR)
-                h, w, _ = game_bgr.shape
-                game_view = cv2.resize(game_bgr, (w * SCALE, h * SCALE), interpolation=cv2.INTER_NEAREST)
-                
-                # Draw panel (keep button visually pressed)
-                gamepad_view = draw_gamepad_panel(action_idx, height=game_view.shape[0], is_lstm=True)
-                final_visual = np.hstack((game_view, gamepad_view))
+                if NUM_ENVS == 1:
+                    game_bgr = cv2.cvtColor(envs[0].pyboy.screen.ndarray, cv2.COLOR_RGBA2BGR) # PyBoy 2.0
+                    h, w, _ = game_bgr.shape
+                    game_view = cv2.resize(game_bgr, (w * SCALE, h * SCALE), interpolation=cv2.INTER_NEAREST)
+                    
+                    # Draw panel (keep button visually pressed)
+                    gamepad_view = draw_gamepad_panel(actions[0], height=game_view.shape[0], is_lstm=True)
+                    final_visual = np.hstack((game_view, gamepad_view))
+                else:
+                    final_visual = draw_grid(envs, actions, grid_cols, GRID_SCALE)
                 cv2.imshow("indigoRL | Smooth View", final_visual)
                 
                 if cv2.waitKey(1) & 0xFF == ord('q'):
@@ -149,19 +237,25 @@ def main():
                 if delay > 0:
                     time.sleep(delay)
             
-            # 4. UPDATE REAL OBSERVATION
+            # 4. UPDATE REAL OBSERVATIONS
             # Once 24 frames pass, we take the snapshot for the next AI decision
             # Use internal _get_obs() because we avoid calling step()
-            obs = env._get_obs()
+            for env in envs:
+                env.ram.refresh(env.pyboy.memory)
+            observations = [env._get_obs() for env in envs]
             
             # Reset episode flag
-            episode_starts = np.zeros((1,), dtype=bool)
+            episode_starts = np.zeros((NUM_ENVS,), dtype=bool)
+            step_count += NUM_ENVS
 
     except KeyboardInterrupt: pass
     except Exception as e: print(f"Error: {e}")
     finally:
-        env.close()
+        print(f"--- {step_count} pasos ({NUM_ENVS} envs) ---")
+        watcher.stop()
+        for env in envs:
+            env.close()
         cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
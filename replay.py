@@ -0,0 +1,59 @@
+import argparse
+import os
+import cv2
+from src.environment.recorder import REWARD_COMPONENTS, TrajectoryReplayer
+
+# --- CONFIGURATION ---
+VIDEO_FPS = 10 # Agent steps per second of video
+SCALE = 3
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded episode (episode_*.npz from record_dir)")
+    parser.add_argument('episode', help="Path to an episode_*.npz file")
+    parser.add_argument('--rom', help="ROM path (defaults to the one stored in the recording)")
+    parser.add_argument('--start', type=int, default=0, help="First step")
+    parser.add_argument('--end', type=int, help="Last step (default: end of the episode)")
+    parser.add_argument('--video', help="Export start..end to this video file (.mp4 / .avi)")
+    parser.add_argument('--frames', help="Export start..end as PNGs into this directory")
+    parser.add_argument('--verify', action='store_true', help="Check the replay reproduces the recorded rewards")
+    args = parser.parse_args()
+
+    replayer = TrajectoryReplayer(args.episode, rom_path=args.rom)
+    meta = replayer.meta
+    print(f"--- EPISODIO: {args.episode} ---")
+    print(f"Pasos: {replayer.num_steps} | Fin: {meta['end']} | Recompensa total: {meta['total_reward']:.2f} | "
+          f"Keyframes: {len(replayer.keyframes)}")
+    totals = replayer.rewards.sum(axis=0)
+    print(" | ".join(f"{name}: {total:.2f}" for name, total in zip(REWARD_COMPONENTS, totals)))
+
+    if args.verify:
+        mismatch = replayer.verify()
+        if mismatch is None:
+            print("✅ Replay determinista: recompensas idénticas")
+        else:
+            print(f"❌ El replay diverge en el paso {mismatch}")
+
+    writer = None
+    if args.video:
+        height, width = replayer.screen().shape[:2]
+        fourcc = cv2.VideoWriter_fourcc(*('mp4v' if args.video.endswith('.mp4') else 'MJPG'))
+        writer = cv2.VideoWriter(args.video, fourcc, VIDEO_FPS, (width * SCALE, height * SCALE))
+    if args.frames:
+        os.makedirs(args.frames, exist_ok=True)
+
+    if writer or args.frames:
+        for step, frame in replayer.frames(args.start, args.end):
+            bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+            if writer:
+                writer.write(cv2.resize(bgr, None, fx=SCALE, fy=SCALE, interpolation=cv2.INTER_NEAREST))
+            if args.frames:
+                cv2.imwrite(os.path.join(args.frames, f"step_{step:06d}.png"), bgr)
+        if writer:
+            writer.release()
+            print(f"✅ Video guardado en: {args.video}")
+        if args.frames:
+            print(f"✅ Frames guardados en: {args.frames}")
+    replayer.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from train_lstm import EXPERIMENTS_DIR, default_config
+
+# --- CONFIGURATION ---
+# Runs several train_lstm.py configs at once on one machine. Each run gets a core budget
+# (learner + one core per env worker), its workers are pinned to those cores, and runs
+# wait in the queue until enough cores are free, so nothing is oversubscribed.
+POLL_INTERVAL = 10 # Seconds between scheduling passes / throughput reports
+STATUS_STALE = 120 # status.json older than this does not count towards the aggregate
+
+def parse_cores(text):
+    """'0-7,12,14' -> [0, ..., 7, 12, 14]"""
+    cores = []
+    for part in text.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            cores.extend(range(int(first), int(last) + 1))
+        else:
+            cores.append(int(part))
+    return cores
+
+def merge(base, overrides):
+    """Same merge rule as train_lstm.load_config: env_kwargs / model_kwargs key by key."""
+    config = {key: dict(value) if isinstance(value, dict) else value for key, value in base.items()}
+    for key, value in overrides.items():
+        if key in ('env_kwargs', 'model_kwargs'):
+            config[key] = {**config.get(key, {}), **value}
+        else:
+            config[key] = value
+    return config
+
+def expand_sweep(spec):
+    """
+    Sweep spec -> list of run configs. The spec has a `base` config plus `runs` (explicit
+    overrides, each with its `session_name`) and/or `grid` (dotted key -> list of values,
+    one run per combination, e.g. {"model_kwargs.ent_coef": [0.01, 0.02]}).
+    """
+    name = spec.get('name', 'sweep')
+    base = spec.get('base', {})
+    runs = [merge(base, run) for run in spec.get('runs', [])]
+    grid = spec.get('grid', {})
+    if grid:
+        keys = list(grid)
+        for values in itertools.product(*(grid[key] for key in keys)):
+            overrides, tags = {}, []
+            for key, value in zip(keys, values):
+                section, _, field = key.rpartition('.')
+                if section: overrides.setdefault(section, {})[field] = value
+                else: overrides[field] = value
+                # Values become part of a directory name: no spaces, brackets or slashes
+                tags.append(f"{field}{re.sub(r'[^A-Za-z0-9.-]+', '-', str(value)).strip('-')}")
+            config = merge(base, overrides)
+            config['session_name'] = f"{base.get('session_name', name)}_{'_'.join(tags)}"
+            runs.append(config)
+    for i, run in enumerate(runs):
+        run.setdefault('session_name', f"{name}_{i:02d}")
+    sessions = [run['session_name'] for run in runs]
+    if len(set(sessions)) != len(sessions):
+        raise ValueError(f"Duplicate session names in sweep: {sessions}")
+    return name, runs
+
+def core_budget(run):
+    """Learner core + one core per env worker, unless the run sets `core_budget`."""
+    if 'core_budget' in run: return run['core_budget']
+    defaults = default_config()
+    num_cpu = run.get('num_cpu', defaults['num_cpu'])
+    envs_per_worker = run.get('envs_per_worker', defaults['envs_per_worker'])
+    return -(-num_cpu // envs_per_worker) + 1
+
+def read_status(session_dir):
+    try:
+        with open(os.path.join(session_dir, "status.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def launch(run, cores):
+    session_dir = os.path.join(EXPERIMENTS_DIR, run['session_name'])
+    os.makedirs(session_dir, exist_ok=True)
+    config = {key: value for key, value in run.items() if key != 'core_budget'}
+    config.update(cores=cores, progress_bar=False)
+    config_path = os.path.join(session_dir, "config.json")
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=2)
+    log = open(os.path.join(session_dir, "train.log"), "a")
+    process = subprocess.Popen([sys.executable, "train_lstm.py", "--config", config_path],
+                               stdout=log, stderr=subprocess.STDOUT)
+    return {'session': run['session_name'], 'dir': session_dir, 'cores': cores, 'process': process,
+            'log': log, 'start': time.time()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a sweep of train_lstm.py configs with CPU pinning")
+    parser.add_argument('spec', help="Sweep spec JSON (base + runs and/or grid)")
+    parser.add_argument('--cores', help="Cores to schedule on, e.g. '0-15' (default: all available)")
+    parser.add_argument('--dry-run', action='store_true', help="Print the runs and their budgets only")
+    args = parser.parse_args()
+
+    with open(args.spec) as f:
+        name, runs = expand_sweep(json.load(f))
+    available = parse_cores(args.cores) if args.cores else sorted(os.sched_getaffinity(0))
+    pending = []
+    for run in runs:
+        budget = core_budget(run)
+        if budget > len(available):
+            print(f"⚠️ {run['session_name']}: presupuesto de {budget} núcleos > {len(available)} disponibles, "
+                  f"se limita a {len(available)}")
+            budget = len(available)
+        pending.append((run, budget))
+
+    print(f"--- SWEEP {name}: {len(runs)} runs en {len(available)} núcleos ---")
+    for run, budget in pending:
+        print(f"  {run['session_name']}: {budget} núcleos, {run.get('num_cpu', default_config()['num_cpu'])} envs")
+    if args.dry_run: return
+
+    free = list(available)
+    running, finished = [], []
+    sweep_start = time.time()
+    try:
+        while pending or running:
+            # Free the cores of finished runs
+            for job in [job for job in running if job['process'].poll() is not None]:
+                job['end'] = time.time()
+                job['returncode'] = job['process'].returncode
+                job['status'] = read_status(job['dir'])
+                job['log'].close()
+                free.extend(job['cores'])
+                running.remove(job)
+                finished.append(job)
+                icon = "✅" if job['returncode'] == 0 else "❌"
+                print(f"{icon} {job['session']} terminó (código {job['returncode']}, "
+                      f"{(job['end'] - job['start']) / 60:.1f} min)")
+
+            # Start queued runs that fit (in order, smaller ones may go first when a big one waits)
+            for run, budget in list(pending):
+                if budget <= len(free):
+                    free.sort()
+                    cores, free = free[:budget], free[budget:]
+                    running.append(launch(run, cores))
+                    pending.remove((run, budget))
+                    print(f"🚀 {run['session_name']} en núcleos {cores}")
+
+            now = time.time()
+            statuses = [read_status(job['dir']) for job in running]
+            aggregate = sum(s['steps_per_sec'] for s in statuses if s and now - s['updated'] < STATUS_STALE)
+            print(f"⚡ Agregado: {aggregate:.0f} pasos/s | en curso: {len(running)} | en cola: {len(pending)} | "
+                  f"núcleos libres: {len(free)}")
+            if pending or running:
+                time.sleep(POLL_INTERVAL)
+    except KeyboardInterrupt:
+        # Ctrl+C also reached the runs (same process group): let them save and exit
+        print("\n--- Pausa detectada. Esperando a que los runs guarden... ---")
+        for job in running:
+            job['process'].wait()
+            job['end'] = time.time()
+            job['returncode'] = job['process'].returncode
+            job['status'] = read_status(job['dir'])
+            job['log'].close()
+            finished.append(job)
+
+    # Summary: per-run and aggregate env steps/sec over the whole sweep
+    elapsed = time.time() - sweep_start
+    summary = {'name': name, 'cores': available, 'elapsed': elapsed, 'runs': []}
+    total_steps = 0
+    for job in finished:
+        steps = (job['status'] or {}).get('num_timesteps', 0)
+        total_steps += steps
+        summary['runs'].append({'session': job['session'], 'cores': job['cores'], 'returncode': job['returncode'],
+                                'num_timesteps': steps, 'elapsed': job['end'] - job['start'],
+                                'steps_per_sec': steps / max(job['end'] - job['start'], 1e-9)})
+    summary['steps_per_sec'] = total_steps / max(elapsed, 1e-9)
+    summary_path = os.path.join(EXPERIMENTS_DIR, f"sweep_{name}.json")
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"✅ Sweep terminado: {total_steps} pasos en {elapsed / 60:.1f} min "
+          f"({summary['steps_per_sec']:.0f} pasos/s agregados). Resumen en {summary_path}")
+
+if __name__ == "__main__":
+    main()
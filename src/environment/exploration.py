@@ -0,0 +1,59 @@
+import numpy as np
+
+NUM_MAPS = 256 # Map IDs are a single byte
+GRID_SIZE = 256 # So are the X/Y coordinates
+
+class ExplorationMap:
+    """
+    Visit counts per map: one uint8 grid per map ID, allocated the first time the map is
+    entered and kept (zeroed) across episodes, so worker memory stays flat.
+    """
+    def __init__(self):
+        self.grids = {}
+        self.maps_seen = np.zeros(NUM_MAPS, dtype=bool)
+        self.tiles_per_map = np.zeros(NUM_MAPS, dtype=np.int32) # Distinct tiles visited per map
+        self.num_tiles = 0
+        self._touched = []
+
+    def visit_map(self, map_id):
+        """Marks a map as visited. Returns True the first time in the episode."""
+        if self.maps_seen[map_id]:
+            return False
+        self.maps_seen[map_id] = True
+        return True
+
+    def visit(self, x, y, map_id):
+        """Counts a visit to a tile. Returns True the first time in the episode."""
+        grid = self.grids.get(map_id)
+        if grid is None:
+            grid = self.grids[map_id] = np.zeros((GRID_SIZE, GRID_SIZE), dtype=np.uint8)
+        count = grid[y, x]
+        if count == 0:
+            if self.tiles_per_map[map_id] == 0:
+                self._touched.append(map_id)
+            self.tiles_per_map[map_id] += 1
+            self.num_tiles += 1
+        if count < 255: # Saturate instead of wrapping around
+            grid[y, x] = count + 1
+        return count == 0
+
+    @property
+    def num_maps(self):
+        return int(self.maps_seen.sum())
+
+    def heatmap(self, map_id):
+        """Visit counts of one map as a (y, x) uint8 array (zeros if never visited)."""
+        grid = self.grids.get(map_id)
+        return grid.copy() if grid is not None else np.zeros((GRID_SIZE, GRID_SIZE), dtype=np.uint8)
+
+    def visited_maps(self):
+        return np.flatnonzero(self.maps_seen)
+
+    def clear(self):
+        # Only zero the grids this episode wrote to; allocations are reused
+        for map_id in self._touched:
+            self.grids[map_id].fill(0)
+        self._touched = []
+        self.maps_seen[:] = False
+        self.tiles_per_map[:] = 0
+        self.num_tiles = 0
@@ -0,0 +1,158 @@
+import struct
+import numpy as np
+
+# Same WRAM addresses PokemonYellowEnv reads
+MEM_MAP_ID = 0xD35D
+MEM_Y_COORD = 0xD360
+MEM_X_COORD = 0xD361
+MEM_IS_IN_BATTLE = 0xD057
+MEM_ENEMY_HP_HIGH = 0xCFE6
+MEM_MY_HP_HIGH = 0xD16C
+MEM_PARTY_SPECIES = 0xD164
+MEM_PARTY_LEVELS = 0xD18C
+MEM_POKEDEX_OWNED = 0xD2F7
+MEM_EVENT_FLAGS_START = 0xD747
+MEM_TEXT_ARROW = 0xC4F2
+MEM_FONT_LOADED = 0xCFC4
+TEXT_ARROW_TILE = 0xEE
+TEXT_LINES = 3 # Lines of the text box opened by each new event
+
+STATE_MAGIC = b"FAKEPYBOY2"
+MAP_SIZE = 32 # Tiles per side of every fake map
+
+class FakeMemory:
+    """64 KB address space with the same int/slice indexing as `pyboy.memory`."""
+    def __init__(self):
+        self.data = bytearray(0x10000)
+
+    def __getitem__(self, addr):
+        if isinstance(addr, slice):
+            return list(self.data[addr])
+        return self.data[addr]
+
+    def __setitem__(self, addr, value):
+        if isinstance(addr, slice):
+            self.data[addr] = bytes(value)
+        else:
+            self.data[addr] = value
+
+class FakeScreen:
+    def __init__(self):
+        self.ndarray = np.zeros((144, 160, 4), dtype=np.uint8)
+        self.ndarray[:, :, 3] = 255
+
+class FakePyBoy:
+    """
+    Deterministic stand-in for PyBoy, for benchmarks and CI boxes without the ROM.
+
+    Implements the surface PokemonYellowEnv uses (`memory`, `screen`, `tick`, `button`,
+    `load_state`, `save_state`, `set_emulation_speed`, `stop`). Each press moves the
+    player on a small grid, walking off an edge changes map, 'a' presses now and then
+    set an event flag (and open a short text box that 'a' advances), and battles start and end on a fixed schedule, so every reward
+    term gets exercised. Game logic costs next to nothing: timings measure the env.
+    """
+    def __init__(self, gamerom=None, window="null", **kwargs):
+        self.memory = FakeMemory()
+        self.screen = FakeScreen()
+        self.frame_count = 0
+        self.pending = None
+        # Static texture the screen is cut from, scrolled by position and tinted by map
+        rng = np.random.default_rng(0)
+        self.texture = rng.integers(0, 4, size=(144 + MAP_SIZE * 4, 160 + MAP_SIZE * 4), dtype=np.uint8) * 85
+        self._boot()
+
+    def _boot(self):
+        self.frame_count = 0
+        self.pending = None
+        self.text_lines = 0
+        mem = self.memory
+        mem.data[:] = bytes(0x10000)
+        mem[MEM_MAP_ID] = 0
+        mem[MEM_X_COORD] = MAP_SIZE // 2
+        mem[MEM_Y_COORD] = MAP_SIZE // 2
+        mem[MEM_PARTY_SPECIES] = 0x54 # Pikachu
+        mem[MEM_PARTY_LEVELS] = 5
+        mem[MEM_MY_HP_HIGH + 1] = 20
+
+    def set_emulation_speed(self, target_speed):
+        pass
+
+    def button(self, input, delay=1):
+        self.pending = input.lower()
+
+    def tick(self, count=1, render=True, sound=True):
+        self.frame_count += count
+        if self.pending is not None:
+            self._apply(self.pending)
+            self.pending = None
+        self._battle_schedule()
+        if render:
+            self._render()
+        return True
+
+    def _apply(self, button):
+        mem = self.memory
+        if self.text_lines:
+            # Text box open: only 'a' does anything, it shows the next line or closes the box
+            if button == 'a':
+                self.text_lines -= 1
+                mem[MEM_TEXT_ARROW] = TEXT_ARROW_TILE if self.text_lines else 0
+                mem[MEM_FONT_LOADED] = 1 if self.text_lines else 0
+            return
+        x, y, map_id = mem[MEM_X_COORD], mem[MEM_Y_COORD], mem[MEM_MAP_ID]
+        dx, dy = {'left': (-1, 0), 'right': (1, 0), 'up': (0, -1), 'down': (0, 1)}.get(button, (0, 0))
+        x, y = x + dx, y + dy
+        if not (0 <= x < MAP_SIZE and 0 <= y < MAP_SIZE):
+            # Walking off the edge leads to a neighbouring map
+            map_id = (map_id + (1 if dx + dy > 0 else 255)) % 256
+            x, y = x % MAP_SIZE, y % MAP_SIZE
+        mem[MEM_X_COORD], mem[MEM_Y_COORD], mem[MEM_MAP_ID] = x, y, map_id
+
+        if button == 'a' and (x * 7 + y * 13 + map_id) % 29 == 0:
+            flag = (x + y * MAP_SIZE + map_id) % (320 * 8)
+            if not mem[MEM_EVENT_FLAGS_START + flag // 8] & (1 << (flag % 8)):
+                mem[MEM_EVENT_FLAGS_START + flag // 8] |= 1 << (flag % 8)
+                self.text_lines = TEXT_LINES
+                mem[MEM_TEXT_ARROW] = TEXT_ARROW_TILE
+                mem[MEM_FONT_LOADED] = 1
+        if mem[MEM_IS_IN_BATTLE]:
+            hp = max(0, mem[MEM_ENEMY_HP_HIGH + 1] - (3 if button == 'a' else 0))
+            mem[MEM_ENEMY_HP_HIGH + 1] = hp
+
+    def _battle_schedule(self):
+        mem = self.memory
+        phase = (self.frame_count // 24) % 500
+        if phase == 400 and not mem[MEM_IS_IN_BATTLE]:
+            mem[MEM_IS_IN_BATTLE] = 1
+            mem[MEM_ENEMY_HP_HIGH + 1] = 30
+        elif phase == 0 and mem[MEM_IS_IN_BATTLE]:
+            mem[MEM_IS_IN_BATTLE] = 0
+            mem[MEM_ENEMY_HP_HIGH + 1] = 0
+            dex = (self.frame_count // 24 // 500) % 151
+            mem[MEM_POKEDEX_OWNED + dex // 8] |= 1 << (dex % 8)
+
+    def _render(self):
+        mem = self.memory
+        x, y, map_id = mem[MEM_X_COORD], mem[MEM_Y_COORD], mem[MEM_MAP_ID]
+        window = self.texture[y * 4:y * 4 + 144, x * 4:x * 4 + 160]
+        tint = (map_id * 37) % 64
+        for channel in range(3):
+            np.add(window, tint * channel, out=self.screen.ndarray[:, :, channel], casting='unsafe')
+
+    def save_state(self, file_like_object):
+        file_like_object.write(STATE_MAGIC)
+        file_like_object.write(struct.pack("<QB", self.frame_count, self.text_lines))
+        file_like_object.write(bytes(self.memory.data))
+
+    def load_state(self, file_like_object):
+        if file_like_object.read(len(STATE_MAGIC)) != STATE_MAGIC:
+            # Real PyBoy savestate (e.g. states/start.state): start from the fake boot state
+            self._boot()
+        else:
+            self.frame_count, self.text_lines = struct.unpack("<QB", file_like_object.read(9))
+            self.memory.data[:] = file_like_object.read(0x10000)
+            self.pending = None
+        self._render()
+
+    def stop(self, save=True):
+        pass
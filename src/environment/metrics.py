@@ -0,0 +1,90 @@
+from multiprocessing import shared_memory
+import numpy as np
+from src.environment.recorder import REWARD_COMPONENTS
+
+# Why an episode ended (index stored in the record)
+END_REASONS = ('max_steps', 'stagnation')
+START_KINDS = ('start_state', 'archive')
+
+# One fixed-size record per finished episode
+EPISODE_DTYPE = np.dtype([
+    ('length', np.int32),
+    ('reward', np.float32),
+    ('events', np.int32), # Event flags gained during the episode
+    ('maps', np.int32), # Distinct maps visited
+    ('dex', np.int32), # Pokedex entries gained
+    ('tiles', np.int32), # Distinct tiles visited
+    ('anti_rock_bonus', np.uint8),
+    ('end_reason', np.uint8),
+    ('start', np.uint8),
+    ('skipped_frames', np.int64),
+] + [(f'reward_{name}', np.float32) for name in REWARD_COMPONENTS])
+
+HEADER_WIDTH = 8 # int64 per slot: 64 bytes, so no two slots share a cache line
+HEAD, DROPPED, TAIL = 0, 1, 4 # Head/dropped written by the worker, tail by the trainer
+
+class EpisodeMetricsRing:
+    """
+    Episode records from every env, in one shared memory block: a single-producer /
+    single-consumer ring per env slot. The worker hosting slot i appends with
+    `writer(i).push(...)` (a few stores, no pickling, no pipe traffic); the trainer
+    copies everything new out with `drain()` whenever it wants, e.g. once per rollout.
+
+    Each side only ever advances its own counter (head after the record is written,
+    tail after it has been copied), so no lock is needed. When a ring is full the new
+    record is dropped and counted instead of blocking the env.
+    """
+    def __init__(self, num_slots, capacity=1024, name=None):
+        self.num_slots = num_slots
+        self.capacity = capacity
+        header_bytes = num_slots * HEADER_WIDTH * 8
+        size = header_bytes + num_slots * capacity * EPISODE_DTYPE.itemsize
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.header = np.ndarray((num_slots, HEADER_WIDTH), dtype=np.int64, buffer=self.shm.buf)
+        self.records = np.ndarray((num_slots, capacity), dtype=EPISODE_DTYPE, buffer=self.shm.buf, offset=header_bytes)
+        if self.owner:
+            self.header[:] = 0
+
+    def spec(self):
+        """What a worker needs to attach: EpisodeMetricsRing(*spec)."""
+        return (self.num_slots, self.capacity, self.shm.name)
+
+    def writer(self, slot):
+        return EpisodeMetricsWriter(self, slot)
+
+    def drain(self):
+        """All records pushed since the last drain (one structured array) and the total dropped."""
+        chunks = []
+        for slot in range(self.num_slots):
+            head, tail = int(self.header[slot, HEAD]), int(self.header[slot, TAIL])
+            if head == tail: continue
+            positions = np.arange(tail, head) % self.capacity
+            chunks.append(self.records[slot, positions]) # Fancy indexing copies
+            self.header[slot, TAIL] = head
+        records = np.concatenate(chunks) if chunks else np.empty(0, dtype=EPISODE_DTYPE)
+        return records, int(self.header[:, DROPPED].sum())
+
+    def close(self):
+        self.header = self.records = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class EpisodeMetricsWriter:
+    """The producer side of one slot (lives in the worker process)."""
+    def __init__(self, ring, slot):
+        self.header = ring.header[slot]
+        self.records = ring.records[slot]
+        self.capacity = ring.capacity
+
+    def push(self, **fields):
+        head = int(self.header[HEAD])
+        if head - int(self.header[TAIL]) >= self.capacity:
+            self.header[DROPPED] += 1
+            return
+        index = head % self.capacity
+        self.records[index] = 0 # Fields not given read as 0, not as a stale episode
+        for name, value in fields.items():
+            self.records[name][index] = value
+        self.header[HEAD] = head + 1 # Published only once the record is complete
@@ -1,19 +1,132 @@
 import io
 import os
 import random
+import time
 from gymnasium import Env, spaces
 import numpy as np
 from pyboy import PyBoy
-from skimage.transform import resize
+from src.environment.exploration import ExplorationMap
+from src.environment.fake_pyboy import FakePyBoy
+from src.environment.metrics import END_REASONS, START_KINDS
+from src.environment.profiling import StepProfiler, acquire_sampling_profiler
+from src.environment.ram_snapshot import RamSnapshot
+from src.environment.recorder import REWARD_COMPONENTS, TrajectoryRecorder
+from src.environment.screen import GB_SCREEN_SHAPE, ScreenProcessor
+from src.environment.state_archive import StateArchive
+from src.environment.symbolic import SYMBOLIC_REGIONS, SYMBOLIC_SIZE, encode_symbolic
+from src.environment.watchdog import ProgressWatchdog
+
+# Emulator settings per profile. 'fast' is meant for headless training: no sound emulation,
+# no window/plugin input handling, and only the frame the agent observes gets rendered.
+EMULATION_PROFILES = {
+    'legacy': {'pyboy_kwargs': {}, 'skip_render': False},
+    'fast': {'pyboy_kwargs': {'sound_emulated': False, 'no_input': True}, 'skip_render': True},
+}
+
+# Dialogue fast-forward: frames per emulator burst, and how long to wait for the next
+# line of an open text box before handing control back to the policy
+FAST_FORWARD_CHUNK = 8
+FAST_FORWARD_SETTLE = 48
+
+# Savestates are read from disk once per process and shared by every reset
+_STATE_CACHE = {}
+_WARNED_NO_STATE = False
+
+def _warn_no_start_state():
+    # Once per process, not on every reset
+    global _WARNED_NO_STATE
+    if not _WARNED_NO_STATE:
+        print("⚠️ Iniciando desde el principio (No se encontró start.state)")
+        _WARNED_NO_STATE = True
+
+def load_state_bytes(state_path):
+    """Returns the raw bytes of a savestate file (cached), or None if it does not exist."""
+    if state_path not in _STATE_CACHE:
+        if not os.path.exists(state_path):
+            return None
+        with open(state_path, "rb") as f:
+            _STATE_CACHE[state_path] = f.read()
+    return _STATE_CACHE[state_path]
 
 class PokemonYellowEnv(Env):
-    def __init__(self, rom_path, render_mode='rgb_array', observation_type='multi'):
+    def __init__(self, rom_path, render_mode='rgb_array', observation_type='multi',
+                 state_path="states/start.state", fast_reset=True,
+                 screen_resolution=GB_SCREEN_SHAPE, grayscale=False, frame_stack=1, screen_interval=1,
+                 emulation_profile='fast', frames_per_action=24, frames_to_hold=1,
+                 profile_interval=1000, sampling_profile_dir=None, backend='pyboy',
+                 archive_dir=None, archive_reset_prob=0.0, archive_max_mb=64, archive_sync_interval=10,
+                 fast_forward=False, fast_forward_max_frames=600, watchdog_windows=None,
+                 record_dir=None, record_keyframe_interval=1000, record_keep_last=None, copy_obs=True):
         super().__init__()
         self.rom_path = rom_path
         self.render_mode = render_mode
+        # 'multi': screen + 7-float RAM vector, screen refreshed every screen_interval steps
+        # 'ram': no screen at all, wide symbolic vector decoded from RAM (see symbolic.py)
+        if observation_type not in ('multi', 'ram'):
+            raise ValueError(f"Unknown observation_type '{observation_type}', expected 'multi' or 'ram'")
         self.observation_type = observation_type
+        self.screen_interval = screen_interval
+        # Observations are built in preallocated buffers; copy_obs=True returns copies so
+        # callers may keep them (DummyVecEnv's terminal_observation does). SharedMemoryVecEnv
+        # turns it off: it copies into shared memory right away.
+        self.copy_obs = copy_obs
+        self.state_path = state_path
+        # fast_reset=True keeps one emulator for the env's whole life and restores the
+        # start state from memory. False rebuilds PyBoy and rereads the file every reset.
+        self.fast_reset = fast_reset
+        if emulation_profile not in EMULATION_PROFILES:
+            raise ValueError(f"Unknown emulation_profile '{emulation_profile}', expected one of {list(EMULATION_PROFILES)}")
+        self.emulation_profile = emulation_profile
+        self.frames_per_action = frames_per_action # Emulated frames per agent decision
+        self.frames_to_hold = frames_to_hold # Frames the button stays pressed within an action
+        if backend not in ('pyboy', 'fake'):
+            raise ValueError(f"Unknown backend '{backend}', expected 'pyboy' or 'fake'")
+        self.backend = backend # 'fake' = deterministic stand-in emulator, no ROM needed
+        # fast_forward=True advances text boxes and scripted sequences inside step(),
+        # up to fast_forward_max_frames per step, without asking the policy
+        self.fast_forward = fast_forward
+        self.fast_forward_max_frames = fast_forward_max_frames
         self.upload_interval = 300 # num of coords captured before sent to stream. needs adjusted based off training speed.
 
+        # Savestate archive: states captured on progress, sampled as episode starts.
+        # Workers sharing archive_dir see each other's states after a sync.
+        self.archive = None
+        if archive_dir:
+            self.archive = StateArchive(archive_dir, max_bytes=archive_max_mb * 1024 * 1024)
+        self.archive_reset_prob = archive_reset_prob
+        self.archive_sync_interval = archive_sync_interval
+        self.reset_count = 0
+        self.progress_made = False
+
+        # Stagnation truncation: e.g. {'events': 8192, 'maps': 4096, 'dex': 8192, 'tiles': 1024}
+        # ends the episode once no signal has shown novelty within its window (None = off)
+        self.watchdog = ProgressWatchdog(watchdog_windows)
+
+        # Trajectory recording: actions, reward components and savestate keyframes per episode
+        # (no frames), replayable with replay.py
+        self.recorder = None
+        if record_dir:
+            self.recorder = TrajectoryRecorder(record_dir, keyframe_interval=record_keyframe_interval,
+                                               keep_last=record_keep_last)
+        self.reward_components = dict.fromkeys(REWARD_COMPONENTS, 0.0)
+
+        # Episode metrics channel (EpisodeMetricsWriter, attached by SharedMemoryVecEnv):
+        # one fixed-size record per finished episode, nothing per step
+        self.metrics = None
+        self.episode_totals = dict.fromkeys(REWARD_COMPONENTS, 0.0)
+        self.episode_skipped_frames = 0
+        self.episode_start = 'start_state'
+        self.start_event_count = 0
+        self.start_dex_count = 0
+
+        # Per-phase step timings, reported in info['perf'] every profile_interval steps
+        self.profiler = StepProfiler(profile_interval) if profile_interval else None
+        # Opt-in sampling profiler, dumps profile_<pid>.folded on close
+        self.sampling_profiler = None
+        if sampling_profile_dir:
+            # Shared by every env in this process (one SIGPROF timer per process)
+            self.sampling_profiler = acquire_sampling_profiler(sampling_profile_dir)
+
         # --- MEMORY ADDRESSES (Extracted from wram.asm) ---
         self.MEM_EVENT_FLAGS_START = 0xD747
         self.MEM_EVENT_FLAGS_END = 0xD747 + 320 
@@ -32,37 +145,55 @@ class PokemonYellowEnv(Env):
         self.MEM_POKEDEX_OWNED = 0xD2F7 
         self.MEM_PARTY_SPECIES = 0xD164
         self.MEM_IS_IN_BATTLE = 0xD057
-        
-        
+        self.MEM_TEXT_ARROW = 0xC4F2 # wTileMap tile (18, 16): blinking ▼ while a text box waits for a button
+        self.MEM_JOY_IGNORE = 0xCD6B # Non-zero while a script has the joypad (cutscenes, forced walks)
+        self.MEM_FONT_LOADED = 0xCFC4 # Bit 0 set while a text box is open
+        self.TEXT_ARROW_TILE = 0xEE
+
+        # One slice read per block each step; everything below decodes from this copy
+        self.ram = RamSnapshot([
+            (self.MEM_ENEMY_HP_HIGH, self.MEM_ENEMY_HP_LOW + 1),
+            (self.MEM_IS_IN_BATTLE, self.MEM_IS_IN_BATTLE + 1),
+            (self.MEM_PARTY_SPECIES, self.MEM_PARTY_LEVELS + 1), # Species list, HP and level of slot 1
+            (self.MEM_POKEDEX_OWNED, self.MEM_POKEDEX_OWNED + 19),
+            (self.MEM_MAP_ID, self.MEM_X_COORD + 1), # Map ID, Y, X
+            (self.MEM_EVENT_FLAGS_START, self.MEM_EVENT_FLAGS_END),
+        ] + (SYMBOLIC_REGIONS if observation_type == 'ram' else []))
+
         # PyBoy 2.0 Configuration
-        window_type = "null" if render_mode == 'rgb_array' else "SDL2"
-        self.pyboy = PyBoy(rom_path, window=window_type)
-        if render_mode == 'rgb_array':
-            self.pyboy.set_emulation_speed(0) 
+        self.pyboy = self._make_emulator()
 
-        self.screen_width = 160
-        self.screen_height = 144
+        self.screen_height, self.screen_width = screen_resolution
         self.render_callback = None 
 
+        # Screen pipeline: e.g. (72, 80) or (36, 40), grayscale, k-frame stack
+        self.screen = ScreenProcessor(screen_resolution, grayscale=grayscale, frame_stack=frame_stack)
+
         self.valid_actions = ['down', 'left', 'right', 'up', 'a', 'b', 'start']
         self.action_space = spaces.Discrete(len(self.valid_actions))
 
         # --- OBSERVATION (FLOAT32 FOR STABILITY) ---
-        self.output_shape = (3, self.screen_height, self.screen_width)
-        screen_space = spaces.Box(low=0, high=255, shape=self.output_shape, dtype=np.uint8)
-        
-        # Normalized RAM: [X, Y, MapID, MyHP, EnemyHP, Levels, InBattle]
-        ram_space = spaces.Box(low=0.0, high=1.0, shape=(7,), dtype=np.float32)
+        if observation_type == 'ram':
+            # Position/facing, party, battle block, event flag bits, dex bits
+            self.symbolic = np.zeros(SYMBOLIC_SIZE, dtype=np.float32)
+            self.observation_space = spaces.Dict({
+                'ram': spaces.Box(low=0.0, high=1.0, shape=(SYMBOLIC_SIZE,), dtype=np.float32)
+            })
+        else:
+            self.output_shape = self.screen.shape
+            screen_space = spaces.Box(low=0, high=255, shape=self.output_shape, dtype=np.uint8)
+            
+            # Normalized RAM: [X, Y, MapID, MyHP, EnemyHP, Levels, InBattle]
+            ram_space = spaces.Box(low=0.0, high=1.0, shape=(7,), dtype=np.float32)
 
-        self.observation_space = spaces.Dict({
-            'screen': screen_space,
-            'ram': ram_space
-        })
+            self.observation_space = spaces.Dict({
+                'screen': screen_space,
+                'ram': ram_space
+            })
 
         # Internal state variables
-        self.visited_maps = set()
-        self.visited_coords = set()
-        self.coords = ()
+        self.exploration = ExplorationMap() # Visited maps and per-map tile grids
+        self.coords = (0, 0, 0)
         self.last_event_count = 0
         self.last_hp = 1.0
         self.last_party_levels = 0
@@ -73,28 +204,57 @@ class PokemonYellowEnv(Env):
         
         self.max_steps = 2048 * 8 
 
+    def _make_emulator(self):
+        if self.backend == 'fake':
+            return FakePyBoy(self.rom_path)
+        window_type = "null" if self.render_mode == 'rgb_array' else "SDL2"
+        pyboy_kwargs = dict(EMULATION_PROFILES[self.emulation_profile]['pyboy_kwargs'])
+        if window_type != "null":
+            pyboy_kwargs.pop('no_input', None) # The SDL2 window still needs its events
+        pyboy = PyBoy(self.rom_path, window=window_type, **pyboy_kwargs)
+        if self.render_mode == 'rgb_array': pyboy.set_emulation_speed(0)
+        return pyboy
+
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
-        
-        if hasattr(self, 'pyboy'): self.pyboy.stop()
-
-        window_type = "null" if self.render_mode == 'rgb_array' else "SDL2"
-        self.pyboy = PyBoy(self.rom_path, window=window_type)
-        if self.render_mode == 'rgb_array': self.pyboy.set_emulation_speed(0)
-
-        # Load state to skip intro
-        state_path = "states/start.state"
-        if os.path.exists(state_path):
-            with open(state_path, "rb") as f:
-                self.pyboy.load_state(f)
+        self.reset_count += 1
+
+        # Pick the episode start: options['state'] (raw savestate bytes), the archive (sometimes) or start.state
+        archived_state = (options or {}).get('state')
+        if archived_state is None and self.archive is not None:
+            if self.reset_count % self.archive_sync_interval == 0: self.archive.sync()
+            if len(self.archive) and self.np_random.random() < self.archive_reset_prob:
+                archived_state = self.archive.sample(self.np_random)
+
+        if self.fast_reset:
+            # Reuse the running emulator, restore the cached start state
+            state = archived_state or load_state_bytes(self.state_path)
+            if state is not None:
+                self.pyboy.load_state(io.BytesIO(state))
+            else:
+                # Without a savestate the only way back to the start is a fresh boot
+                self.pyboy.stop()
+                self.pyboy = self._make_emulator()
+                _warn_no_start_state()
         else:
-            print("⚠️ Iniciando desde el principio (No se encontró start.state)")
+            if hasattr(self, 'pyboy'): self.pyboy.stop()
+            self.pyboy = self._make_emulator()
+
+            # Load state to skip intro
+            if archived_state is not None:
+                self.pyboy.load_state(io.BytesIO(archived_state))
+            elif os.path.exists(self.state_path):
+                with open(self.state_path, "rb") as f:
+                    self.pyboy.load_state(f)
+            else:
+                _warn_no_start_state()
 
         # Reset metrics
-        self.visited_maps = set()
-        self.visited_coords = set()
+        self.exploration.clear()
+        self.watchdog.reset()
         self.step_count = 0
         self.has_anti_rock_bonus = False
+        self.ram.refresh(self.pyboy.memory)
         
         # Initial normalized readings
         self.last_hp = self._read_hp() / 700.0
@@ -102,119 +262,258 @@ class PokemonYellowEnv(Env):
         self.last_event_count = self._read_event_count()
         self.last_enemy_hp = self._read_enemy_hp() / 700.0
         self.last_dex_count = self._read_dex_count()
+        self.start_event_count = self.last_event_count
+        self.start_dex_count = self.last_dex_count
+        for name in self.episode_totals: self.episode_totals[name] = 0.0
+        self.episode_skipped_frames = 0
         
-        self.visited_maps.add(self.pyboy.memory[self.MEM_MAP_ID])
+        map_id = self.ram.byte(self.MEM_MAP_ID)
+        self.exploration.visit_map(map_id)
+        self.coords = (self.ram.byte(self.MEM_X_COORD), self.ram.byte(self.MEM_Y_COORD), map_id)
 
-        return self._get_obs(), {}
+        info = {'start': 'archive' if archived_state is not None else 'start_state'}
+        self.episode_start = info['start']
+        if self.recorder is not None:
+            self.recorder.begin_episode(self._save_state_bytes(), self._record_meta(info['start']))
+        return self._get_obs(new_episode=True), info
 
     def step(self, action_idx):
         self.step_count += 1
+        t0 = time.perf_counter()
         
         action = self.valid_actions[action_idx]
-        self.pyboy.button(action)
-        self.pyboy.tick(24) 
+        self.pyboy.button(action, self.frames_to_hold)
+        if EMULATION_PROFILES[self.emulation_profile]['skip_render']:
+            # Advance the skipped frames without drawing, render only the observed one
+            # (and nothing at all when this step's observation has no new screen)
+            self.pyboy.tick(self.frames_per_action - 1, False)
+            self.pyboy.tick(1, self._screen_due())
+        else:
+            self.pyboy.tick(self.frames_per_action)
+        t1 = time.perf_counter()
+        skipped_frames = self._fast_forward() if self.fast_forward else 0
+        t_ff = time.perf_counter()
+        self.ram.refresh(self.pyboy.memory)
+        t2 = time.perf_counter()
 
         if self.render_callback: self.render_callback(action_idx)
+        t3 = time.perf_counter()
 
         obs = self._get_obs()
+        t4 = time.perf_counter()
         reward = self._compute_reward()
+        t5 = time.perf_counter()
+        if self.archive is not None and self.progress_made:
+            self._archive_state()
+        if self.recorder is not None:
+            self.recorder.record(action_idx, self.reward_components, self._save_state_bytes)
+        if self.metrics is not None:
+            for name, value in self.reward_components.items():
+                self.episode_totals[name] += value
+            self.episode_skipped_frames += skipped_frames
+        t6 = time.perf_counter()
 
         terminated = False
         truncated = self.step_count >= self.max_steps
-
-        return obs, reward, terminated, truncated, {}
-
-    def _get_obs(self):
-        # Screen processing
-        screen = self.pyboy.screen.ndarray 
-        screen = resize(screen, (self.screen_height, self.screen_width), anti_aliasing=False, preserve_range=True)
-        screen = screen.astype(np.uint8)
-        if screen.shape[2] == 4: screen = screen[:, :, :3]
-        screen = np.moveaxis(screen, 2, 0)
+        stalled = None if truncated else self.watchdog.stalled(self.step_count)
+
+        info = {'skipped_frames': skipped_frames} if self.fast_forward else {}
+        if truncated:
+            info['truncation_reason'] = 'max_steps'
+        elif stalled:
+            truncated = True
+            info['truncation_reason'] = 'stagnation'
+            info['steps_without_novelty'] = stalled
+        if truncated and self.recorder is not None:
+            self.recorder.end_episode(info['truncation_reason'])
+        if truncated and self.metrics is not None:
+            self._push_metrics(info['truncation_reason'])
+        if self.profiler:
+            self.profiler.add('tick', t1 - t0)
+            if self.fast_forward: self.profiler.add('fast_forward', t_ff - t1)
+            self.profiler.add('ram', t2 - t_ff)
+            self.profiler.add('render_callback', t3 - t2)
+            self.profiler.add('obs', t4 - t3)
+            self.profiler.add('reward', t5 - t4)
+            self.profiler.add('archive', t6 - t5)
+            report = self.profiler.end_step(self.frames_per_action + skipped_frames)
+            if report: info['perf'] = report
+
+        return obs, reward, terminated, truncated, info
+
+    def _fast_forward(self):
+        """
+        Runs the emulator without the policy while the game is not taking decisions:
+        presses 'a' on text boxes waiting for a button, ticks through scripted sequences,
+        and waits briefly for the next line of a text box still being printed.
+        Returns the number of extra frames emulated.
+        """
+        memory = self.pyboy.memory
+        render = not EMULATION_PROFILES[self.emulation_profile]['skip_render']
+        frames = 0
+        settle = 0
+        while frames < self.fast_forward_max_frames:
+            if memory[self.MEM_TEXT_ARROW] == self.TEXT_ARROW_TILE:
+                self.pyboy.button('a', 2)
+                settle = 0
+            elif memory[self.MEM_JOY_IGNORE]:
+                settle = 0
+            elif frames and memory[self.MEM_FONT_LOADED] & 1 and settle < FAST_FORWARD_SETTLE:
+                settle += FAST_FORWARD_CHUNK
+            else:
+                break
+            self.pyboy.tick(FAST_FORWARD_CHUNK, render)
+            frames += FAST_FORWARD_CHUNK
+        if frames and not render:
+            # The observed frame must be a rendered one (always ticked, so the frame count
+            # does not depend on the observation settings and recordings replay exactly)
+            self.pyboy.tick(1, self._screen_due())
+            frames += 1
+        return frames
+
+    def _screen_due(self):
+        return self.observation_type != 'ram' and self.step_count % self.screen_interval == 0
+
+    def _get_obs(self, new_episode=False):
+        if self.observation_type == 'ram':
+            # No screen pipeline: symbolic vector written into a preallocated buffer
+            symbolic = encode_symbolic(self.ram, self.symbolic)
+            return {'ram': symbolic.copy() if self.copy_obs else symbolic}
+
+        # Screen processing (writes into a preallocated buffer, kept between refreshes)
+        if new_episode:
+            screen = self.screen.reset(self.pyboy.screen.ndarray)
+        elif self._screen_due():
+            screen = self.screen.process(self.pyboy.screen.ndarray)
+        else:
+            screen = self.screen.output
 
         # RAM normalization for the AI brain
         ram_data = np.array([
-            np.clip(self.pyboy.memory[self.MEM_X_COORD] / 255.0, 0.0, 1.0),
-            np.clip(self.pyboy.memory[self.MEM_Y_COORD] / 255.0, 0.0, 1.0),
-            np.clip(self.pyboy.memory[self.MEM_MAP_ID] / 255.0, 0.0, 1.0),
+            np.clip(self.ram.byte(self.MEM_X_COORD) / 255.0, 0.0, 1.0),
+            np.clip(self.ram.byte(self.MEM_Y_COORD) / 255.0, 0.0, 1.0),
+            np.clip(self.ram.byte(self.MEM_MAP_ID) / 255.0, 0.0, 1.0),
             np.clip(self._read_hp() / 700.0, 0.0, 1.0),
             np.clip(self._read_enemy_hp() / 700.0, 0.0, 1.0),
             np.clip(self._read_party_levels() / 100.0, 0.0, 1.0),
-            1.0 if self.pyboy.memory[self.MEM_IS_IN_BATTLE] > 0 else 0.0
+            1.0 if self.ram.byte(self.MEM_IS_IN_BATTLE) > 0 else 0.0
         ], dtype=np.float32)
 
-        return {'screen': screen, 'ram': ram_data}
+        return {'screen': screen.copy() if self.copy_obs else screen, 'ram': ram_data}
 
     def _compute_reward(self):
         reward = 0
+        self.progress_made = False # Any new event flag, map or dex entry this step
+        components = self.reward_components # Per-term breakdown (recorded trajectories)
+        for name in components: components[name] = 0.0
         
         # 1. STORY PROGRESS (Event Flags)
         current_event_count = self._read_event_count()
         if current_event_count > self.last_event_count:
-            reward += (current_event_count - self.last_event_count) * 20.0
+            components['events'] = (current_event_count - self.last_event_count) * 20.0
+            reward += components['events']
             self.last_event_count = current_event_count
+            self.progress_made = True
+            self.watchdog.novelty('events', self.step_count)
 
         # 2. MAP EXPLORATION (New areas)
-        map_id = self.pyboy.memory[self.MEM_MAP_ID]
-        if map_id not in self.visited_maps:
-            self.visited_maps.add(map_id)
+        map_id = self.ram.byte(self.MEM_MAP_ID)
+        if self.exploration.visit_map(map_id):
+            components['maps'] = 5.0
             reward += 5.0
+            self.progress_made = True
+            self.watchdog.novelty('maps', self.step_count)
 
         # 3. CAPTURE AND POKEDEX (Encourages party diversity)
         current_dex = self._read_dex_count()
         if current_dex > self.last_dex_count:
+            components['dex'] = 15.0
             reward += 15.0 # Reward for catching any Pokemon
             self.last_dex_count = current_dex
+            self.progress_made = True
+            self.watchdog.novelty('dex', self.step_count)
 
         # 4. KEY PARTY REWARD (Nidoran M=03, Mankey=57/0x39)
         # This guides the AI to find solutions for Brock subtly
         if not self.has_anti_rock_bonus:
-            party = self.pyboy.memory[self.MEM_PARTY_SPECIES : self.MEM_PARTY_SPECIES + 6]
+            party = self.ram.view(self.MEM_PARTY_SPECIES, self.MEM_PARTY_SPECIES + 6)
             if 3 in party or 57 in party:
+                components['party_bonus'] = 25.0
                 reward += 25.0
                 self.has_anti_rock_bonus = True
-                print("💎 Bonus de equipo 'Anti-Roca' detectado!")
 
         # 5. COMBAT (Damage to enemy)
         curr_enemy_hp = self._read_enemy_hp()
         last_enemy_hp_raw = self.last_enemy_hp * 700.0
-        if self.pyboy.memory[self.MEM_IS_IN_BATTLE]:
+        if self.ram.byte(self.MEM_IS_IN_BATTLE):
             if last_enemy_hp_raw > curr_enemy_hp:
-                reward += (last_enemy_hp_raw - curr_enemy_hp) * 0.2
+                components['combat'] = (last_enemy_hp_raw - curr_enemy_hp) * 0.2
+                reward += components['combat']
             self.last_enemy_hp = np.clip(curr_enemy_hp / 700.0, 0.0, 1.0)
         else:
             self.last_enemy_hp = 0.0
 
         # 6. SURVIVAL AND LOCAL EXPLORATION
         # Soft penalty for standing still (loops)
-        coord = (self.pyboy.memory[self.MEM_X_COORD], self.pyboy.memory[self.MEM_Y_COORD], map_id)
-        self.coords = coord
-        if coord not in self.visited_coords:
-            self.visited_coords.add(coord)
+        x, y = self.ram.byte(self.MEM_X_COORD), self.ram.byte(self.MEM_Y_COORD)
+        self.coords = (x, y, map_id)
+        if self.exploration.visit(x, y, map_id):
+            components['exploration'] = 0.02
             reward += 0.02
+            self.watchdog.novelty('tiles', self.step_count)
         else:
+            components['exploration'] = -0.001
             reward -= 0.001
             
         return reward
 
-    # --- MEMORY READING FUNCTIONS ---
+    def _archive_state(self):
+        # Only pay for save_state when the (map, events) frontier is new to the archive
+        map_id = self.ram.byte(self.MEM_MAP_ID)
+        if self.archive.has(map_id, self.last_event_count, self.last_dex_count):
+            return
+        self.archive.add(self._save_state_bytes(), map_id, self.last_event_count, self.last_dex_count)
+
+    def attach_metrics(self, writer):
+        self.metrics = writer
+
+    def _push_metrics(self, end_reason):
+        self.metrics.push(
+            length=self.step_count, reward=sum(self.episode_totals.values()),
+            events=self.last_event_count - self.start_event_count, maps=self.exploration.num_maps,
+            dex=self.last_dex_count - self.start_dex_count, tiles=self.exploration.num_tiles,
+            anti_rock_bonus=self.has_anti_rock_bonus, end_reason=END_REASONS.index(end_reason),
+            start=START_KINDS.index(self.episode_start), skipped_frames=self.episode_skipped_frames,
+            **{f'reward_{name}': total for name, total in self.episode_totals.items()})
+
+    def _save_state_bytes(self):
+        buffer = io.BytesIO()
+        self.pyboy.save_state(buffer)
+        return buffer.getvalue()
+
+    def _record_meta(self, start):
+        # Everything replay needs to re-simulate the episode step by step
+        return {'rom_path': self.rom_path, 'backend': self.backend, 'start': start,
+                'emulation_profile': self.emulation_profile, 'frames_per_action': self.frames_per_action,
+                'frames_to_hold': self.frames_to_hold, 'fast_forward': self.fast_forward,
+                'fast_forward_max_frames': self.fast_forward_max_frames}
+
+    # --- MEMORY READING FUNCTIONS (decoded from the per-step RAM snapshot) ---
     def _read_hp(self):
-        return (self.pyboy.memory[self.MEM_MY_HP_HIGH] << 8) + self.pyboy.memory[self.MEM_MY_HP_LOW]
+        return self.ram.word(self.MEM_MY_HP_HIGH)
 
     def _read_enemy_hp(self):
-        return (self.pyboy.memory[self.MEM_ENEMY_HP_HIGH] << 8) + self.pyboy.memory[self.MEM_ENEMY_HP_LOW]
+        return self.ram.word(self.MEM_ENEMY_HP_HIGH)
     
     def _read_party_levels(self):
-        return self.pyboy.memory[self.MEM_PARTY_LEVELS] 
+        return self.ram.byte(self.MEM_PARTY_LEVELS)
 
     def _read_event_count(self):
-        event_bytes = self.pyboy.memory[self.MEM_EVENT_FLAGS_START : self.MEM_EVENT_FLAGS_END]
-        return sum(bin(byte).count('1') for byte in event_bytes)
+        return self.ram.popcount(self.MEM_EVENT_FLAGS_START, self.MEM_EVENT_FLAGS_END)
 
     def _read_dex_count(self):
         # Counts Pokemon owned in Pokedex
-        dex_bytes = self.pyboy.memory[self.MEM_POKEDEX_OWNED : self.MEM_POKEDEX_OWNED + 19]
-        return sum(bin(byte).count('1') for byte in dex_bytes)
+        return self.ram.popcount(self.MEM_POKEDEX_OWNED, self.MEM_POKEDEX_OWNED + 19)
 
     def render(self):
         return self.pyboy.screen.ndarray
@@ -223,5 +522,9 @@ class PokemonYellowEnv(Env):
         self.render_callback = callback
 
     def close(self):
+        if self.sampling_profiler:
+            self.sampling_profiler.release()
+            self.sampling_profiler = None
+        if self.recorder is not None: self.recorder.end_episode('close')
         if hasattr(self, 'pyboy') and self.pyboy:
             self.pyboy.stop()
\ No newline at end of file
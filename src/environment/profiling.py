@@ -0,0 +1,102 @@
+import atexit
+import os
+import signal
+import time
+from collections import Counter
+
+class StepProfiler:
+    """
+    Per-phase wall-clock accumulators for env.step().
+
+    Phases are added with `add(phase, seconds)`; every `report_interval` steps
+    `end_step` returns the accumulated window (steps, frames, elapsed, per-phase
+    seconds) and starts a new one. Between reports nothing is allocated.
+    """
+    def __init__(self, report_interval=1000):
+        self.report_interval = report_interval
+        self.phases = {}
+        self.steps = 0
+        self.frames = 0
+        self.window_start = time.perf_counter()
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def end_step(self, frames):
+        self.steps += 1
+        self.frames += frames
+        if self.steps < self.report_interval:
+            return None
+        now = time.perf_counter()
+        report = {
+            'steps': self.steps,
+            'frames': self.frames,
+            'elapsed': now - self.window_start, # Includes time spent waiting on the trainer
+            'phases': self.phases,
+        }
+        self.phases = {}
+        self.steps = 0
+        self.frames = 0
+        self.window_start = now
+        return report
+
+class SamplingProfiler:
+    """
+    Statistical profiler for one worker: a SIGPROF timer samples the Python stack of the
+    main thread and the counts are dumped as folded stacks (flamegraph.pl / speedscope
+    format) to `<output_dir>/profile_<pid>.folded`.
+
+    The signal handler and the timer are process-wide, so envs get the process's single
+    instance through `acquire_sampling_profiler` / `release()` instead of building their own.
+    """
+    def __init__(self, output_dir, interval=0.005):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.samples = Counter()
+        self.running = False
+        self.users = 0
+
+    def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self.running = True
+        atexit.register(self.stop)
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        if not self.running:
+            return
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        self.running = False
+        path = os.path.join(self.output_dir, f"profile_{os.getpid()}.folded")
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def release(self):
+        """Drops one user; the last one stops the timer and writes the profile."""
+        self.users -= 1
+        if self.users <= 0:
+            self.stop()
+            _SAMPLING_PROFILERS.pop(os.getpid(), None)
+
+_SAMPLING_PROFILERS = {} # pid -> running SamplingProfiler (keyed by pid: forked children start their own)
+
+def acquire_sampling_profiler(output_dir, interval=0.005):
+    """The process's SamplingProfiler, started on first use. Pair with `release()`."""
+    profiler = _SAMPLING_PROFILERS.get(os.getpid())
+    if profiler is None:
+        profiler = SamplingProfiler(output_dir, interval)
+        profiler.start()
+        _SAMPLING_PROFILERS[os.getpid()] = profiler
+    profiler.users += 1
+    return profiler
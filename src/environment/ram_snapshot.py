@@ -0,0 +1,67 @@
+import numpy as np
+
+# Number of set bits for every byte value, used to count event/dex flags
+POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+class RamSnapshot:
+    """
+    Per-step copy of the WRAM blocks the env reads.
+
+    Each block is copied with one slice read into a single preallocated uint8 buffer,
+    so observations and rewards decode the same bytes instead of hitting
+    `pyboy.memory` address by address.
+    """
+    def __init__(self, regions):
+        # regions: list of (start, end) address ranges, end exclusive. Overlapping or
+        # touching ranges are merged so every byte is read once.
+        merged = []
+        for start, end in sorted(regions):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.layout = []
+        offset = 0
+        for start, end in merged:
+            self.layout.append((start, end, offset))
+            offset += end - start
+        self.buffer = np.zeros(offset, dtype=np.uint8)
+        self._offsets = {}
+        self._views = {}
+
+    def refresh(self, memory):
+        for start, end, offset in self.layout:
+            self.buffer[offset:offset + end - start] = memory[start:end]
+
+    def offset(self, addr):
+        if addr not in self._offsets:
+            for start, end, offset in self.layout:
+                if start <= addr < end:
+                    self._offsets[addr] = offset + addr - start
+                    break
+            else:
+                raise KeyError(f"Address {addr:#06x} is not covered by the RAM snapshot")
+        return self._offsets[addr]
+
+    def byte(self, addr):
+        return int(self.buffer[self.offset(addr)])
+
+    def word(self, addr):
+        # Game Boy multi-byte values (HP, etc.) are stored big-endian
+        i = self.offset(addr)
+        return (int(self.buffer[i]) << 8) + int(self.buffer[i + 1])
+
+    def view(self, start, end):
+        if (start, end) not in self._views:
+            # The whole range must sit in the merged region holding `start`, else the slice
+            # would come back short or run into the next region's bytes
+            i = self.offset(start)
+            region_end = next(e for s, e, _ in self.layout if s <= start < e)
+            if not start < end <= region_end:
+                raise KeyError(f"Range {start:#06x}-{end:#06x} is not inside one region of the RAM snapshot")
+            self._views[(start, end)] = (i, i + end - start)
+        i, j = self._views[(start, end)]
+        return self.buffer[i:j]
+
+    def popcount(self, start, end):
+        return int(POPCOUNT_TABLE[self.view(start, end)].sum())
@@ -0,0 +1,153 @@
+import json
+import os
+import uuid
+import zlib
+from collections import deque
+import numpy as np
+
+# Reward terms of PokemonYellowEnv._compute_reward, in recording column order
+REWARD_COMPONENTS = ('events', 'maps', 'dex', 'party_bonus', 'combat', 'exploration')
+
+class TrajectoryRecorder:
+    """
+    Per-episode trajectory log: the action of every step, the reward components, and a
+    zlib-compressed savestate keyframe at step 0 and every `keyframe_interval` steps.
+    No frames are stored, TrajectoryReplayer re-simulates them from the nearest keyframe.
+
+    Each episode becomes `<output_dir>/episode_<pid>_<id>_<n>.npz` (written when the episode
+    ends, on the next reset, or on close); the random id keeps envs sharing a worker apart.
+    With `keep_last`, only the newest `keep_last` episodes of this recorder are kept on disk.
+    """
+    def __init__(self, output_dir, keyframe_interval=1000, compress_level=6, keep_last=None):
+        self.output_dir = output_dir
+        self.keyframe_interval = keyframe_interval
+        self.compress_level = compress_level
+        self.keep_last = keep_last
+        self.written = deque()
+        self.episode_index = 0
+        self.recorder_id = uuid.uuid4().hex[:6]
+        self.meta = None
+        os.makedirs(output_dir, exist_ok=True)
+
+    @property
+    def recording(self):
+        return self.meta is not None
+
+    def begin_episode(self, state_bytes, meta):
+        if self.recording:
+            self.end_episode('reset')
+        self.meta = dict(meta)
+        self.actions = []
+        self.rewards = []
+        self.keyframe_steps = [0]
+        self.keyframes = [zlib.compress(state_bytes, self.compress_level)]
+
+    def record(self, action, components, save_state):
+        """Logs one step. `save_state` returns the raw savestate, only called on keyframe steps."""
+        if not self.recording: return
+        self.actions.append(action)
+        self.rewards.append([components[name] for name in REWARD_COMPONENTS])
+        step = len(self.actions)
+        if step % self.keyframe_interval == 0:
+            self.keyframe_steps.append(step)
+            self.keyframes.append(zlib.compress(save_state(), self.compress_level))
+
+    def end_episode(self, reason):
+        if not self.recording: return
+        rewards = np.array(self.rewards, dtype=np.float32).reshape(-1, len(REWARD_COMPONENTS))
+        self.meta.update({'steps': len(self.actions), 'end': reason, 'total_reward': float(rewards.sum()),
+                          'reward_components': list(REWARD_COMPONENTS)})
+        offsets = np.cumsum([0] + [len(keyframe) for keyframe in self.keyframes])
+        path = os.path.join(self.output_dir, f"episode_{os.getpid()}_{self.recorder_id}_{self.episode_index:05d}.npz")
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            actions=np.array(self.actions, dtype=np.uint8),
+            rewards=rewards,
+            keyframe_steps=np.array(self.keyframe_steps, dtype=np.int64),
+            keyframe_offsets=offsets.astype(np.int64),
+            keyframes=np.frombuffer(b"".join(self.keyframes), dtype=np.uint8),
+            meta=np.array(json.dumps(self.meta)),
+        )
+        os.replace(tmp_path, path)
+        self.episode_index += 1
+        self.meta = None
+        self.written.append(path)
+        while self.keep_last and len(self.written) > self.keep_last:
+            try:
+                os.remove(self.written.popleft())
+            except FileNotFoundError:
+                pass
+
+class TrajectoryReplayer:
+    """
+    Re-simulates a recorded episode. `seek(step)` restores the nearest keyframe at or
+    before `step` and replays the recorded actions from there, so any step can be
+    reached in at most `keyframe_interval` env steps.
+    """
+    def __init__(self, path, rom_path=None, backend=None):
+        # Imported here: pokemon_env imports this module for REWARD_COMPONENTS
+        from src.environment.pokemon_env import PokemonYellowEnv
+
+        with np.load(path) as data:
+            self.actions = data['actions']
+            self.rewards = data['rewards']
+            self.keyframe_steps = data['keyframe_steps']
+            offsets = data['keyframe_offsets']
+            blob = data['keyframes'].tobytes()
+            self.meta = json.loads(str(data['meta']))
+        self.keyframes = [blob[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        self.num_steps = len(self.actions)
+
+        self.env = PokemonYellowEnv(rom_path or self.meta['rom_path'], render_mode='rgb_array',
+                                    backend=backend or self.meta['backend'],
+                                    emulation_profile=self.meta['emulation_profile'],
+                                    frames_per_action=self.meta['frames_per_action'],
+                                    frames_to_hold=self.meta['frames_to_hold'],
+                                    fast_forward=self.meta['fast_forward'],
+                                    fast_forward_max_frames=self.meta['fast_forward_max_frames'],
+                                    profile_interval=0)
+        self.step = None
+
+    def _keyframe_state(self, index):
+        return zlib.decompress(self.keyframes[index])
+
+    def seek(self, step):
+        """Moves the emulator to the state after `step` actions. Returns the screen (RGB)."""
+        if not 0 <= step <= self.num_steps:
+            raise ValueError(f"step {step} out of range [0, {self.num_steps}]")
+        index = int(np.searchsorted(self.keyframe_steps, step, side='right')) - 1
+        keyframe_step = int(self.keyframe_steps[index])
+        # Keep replaying forward unless the keyframe is closer (or the target is behind us)
+        if self.step is None or not keyframe_step <= self.step <= step:
+            self.env.reset(options={'state': self._keyframe_state(index)})
+            self.env.step_count = self.step = keyframe_step
+        while self.step < step:
+            self.env.step(int(self.actions[self.step]))
+            self.step += 1
+        return self.screen()
+
+    def screen(self):
+        return self.env.render()[:, :, :3]
+
+    def frames(self, start=0, end=None):
+        """Yields (step, RGB screen) for start..end (inclusive)."""
+        end = self.num_steps if end is None else min(end, self.num_steps)
+        yield start, self.seek(start)
+        for step in range(start + 1, end + 1):
+            yield step, self.seek(step)
+
+    def verify(self):
+        """Replays from step 0 and returns the first step whose reward components differ, or None."""
+        self.env.reset(options={'state': self._keyframe_state(0)})
+        self.step = 0
+        for step, action in enumerate(self.actions):
+            self.env.step(int(action))
+            self.step += 1
+            replayed = [self.env.reward_components[name] for name in REWARD_COMPONENTS]
+            if not np.allclose(replayed, self.rewards[step], atol=1e-4):
+                return step
+        return None
+
+    def close(self):
+        self.env.close()
@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+
+GB_SCREEN_SHAPE = (144, 160) # (height, width) of PyBoy's frame
+
+class ScreenProcessor:
+    """
+    Turns PyBoy's RGBA frame into the CNN input, channel-first uint8.
+
+    All intermediate and output arrays are allocated once. `process` returns the same
+    output buffer every call, so callers that keep an observation around must copy it
+    (PokemonYellowEnv returns a copy unless `copy_obs=False`).
+    """
+    def __init__(self, resolution=GB_SCREEN_SHAPE, grayscale=False, frame_stack=1):
+        self.height, self.width = resolution
+        self.grayscale = grayscale
+        self.frame_stack = frame_stack
+        self.channels = 1 if grayscale else 3
+        self.shape = (self.channels * frame_stack, self.height, self.width)
+        self.output = np.zeros(self.shape, dtype=np.uint8)
+
+        self._needs_resize = tuple(resolution) != GB_SCREEN_SHAPE
+        color_shape = () if grayscale else (3,)
+        self._color = np.zeros(GB_SCREEN_SHAPE + color_shape, dtype=np.uint8)
+        self._resized = np.zeros((self.height, self.width) + color_shape, dtype=np.uint8)
+
+    def process(self, screen):
+        # 1. Drop alpha (and colour if requested)
+        code = cv2.COLOR_RGBA2GRAY if self.grayscale else cv2.COLOR_RGBA2RGB
+        cv2.cvtColor(screen, code, dst=self._color)
+        frame = self._color
+
+        # 2. Downsample (area interpolation averages whole pixel blocks)
+        if self._needs_resize:
+            cv2.resize(frame, (self.width, self.height), dst=self._resized, interpolation=cv2.INTER_AREA)
+            frame = self._resized
+
+        # 3. Shift the stack one frame back (chunk by chunk, so no temporary copy)
+        c = self.channels
+        for i in range(self.frame_stack - 1):
+            self.output[i * c:(i + 1) * c] = self.output[(i + 1) * c:(i + 2) * c]
+
+        # 4. Newest frame goes last, channel-first
+        newest = self.output[-c:]
+        if self.grayscale:
+            newest[0] = frame
+        else:
+            np.copyto(newest, frame.transpose(2, 0, 1))
+        return self.output
+
+    def reset(self, screen):
+        # Fill the whole stack with the first frame of the episode
+        self.process(screen)
+        c = self.channels
+        for i in range(self.frame_stack - 1):
+            self.output[i * c:(i + 1) * c] = self.output[-c:]
+        return self.output
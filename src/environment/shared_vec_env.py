@@ -0,0 +1,266 @@
+import math
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper, VecEnv
+from stable_baselines3.common.vec_env.patch_gym import _patch_env
+from stable_baselines3.common.vec_env.util import dict_to_obs, obs_space_info
+from src.environment.metrics import EpisodeMetricsRing
+
+def _copy_obs(observation):
+    # Envs reuse their observation buffers, so anything kept past the next step is copied
+    if isinstance(observation, dict):
+        return {key: np.array(value) for key, value in observation.items()}
+    return np.array(observation)
+
+def _write_obs(buffers, index, observation):
+    for key, buffer in buffers.items():
+        buffer[index] = observation if key is None else observation[key]
+
+def _attach(shm_specs):
+    handles, buffers = [], {}
+    for key, (name, shape, dtype) in shm_specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        handles.append(shm)
+        buffers[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    return handles, buffers
+
+def _worker(remote, parent_remote, env_fns_wrapper, env_offset, core=None):
+    # Import here to avoid a circular import
+    from stable_baselines3.common.env_util import is_wrapped
+
+    parent_remote.close()
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {core}) # Pinned before the emulators start (Linux only)
+    envs = [_patch_env(env_fn()) for env_fn in env_fns_wrapper.var]
+    for env in envs:
+        # Observations go straight into shared memory (terminal ones via _copy_obs): no copy needed
+        if hasattr(env.unwrapped, "copy_obs"): env.unwrapped.copy_obs = False
+    reset_infos = [{} for _ in envs]
+    handles, buffers = [], {}
+    metrics = None
+    remote.send((envs[0].observation_space, envs[0].action_space))
+
+    while True:
+        try:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                rewards, dones, infos = [], [], []
+                for i, (env, action) in enumerate(zip(envs, data)):
+                    observation, reward, terminated, truncated, info = env.step(action)
+                    # convert to SB3 VecEnv api
+                    done = terminated or truncated
+                    info["TimeLimit.truncated"] = truncated and not terminated
+                    if done:
+                        # save final observation where user can get it, then reset
+                        info["terminal_observation"] = _copy_obs(observation)
+                        observation, reset_infos[i] = env.reset()
+                    _write_obs(buffers, env_offset + i, observation)
+                    rewards.append(reward)
+                    dones.append(done)
+                    infos.append(info)
+                remote.send((rewards, dones, infos, reset_infos))
+            elif cmd == "reset":
+                for i, (env, (seed, options)) in enumerate(zip(envs, data)):
+                    maybe_options = {"options": options} if options else {}
+                    observation, reset_infos[i] = env.reset(seed=seed, **maybe_options)
+                    _write_obs(buffers, env_offset + i, observation)
+                remote.send(reset_infos)
+            elif cmd == "attach":
+                shm_specs, metrics_spec = data
+                handles, buffers = _attach(shm_specs)
+                metrics = EpisodeMetricsRing(*metrics_spec)
+                for i, env in enumerate(envs):
+                    # Envs that report episode metrics get their own slot of the ring
+                    if hasattr(env.unwrapped, "attach_metrics"):
+                        env.unwrapped.attach_metrics(metrics.writer(env_offset + i))
+                remote.send(None)
+            elif cmd == "render":
+                remote.send([env.render() for env in envs])
+            elif cmd == "close":
+                for env in envs:
+                    env.close()
+                buffers = {}
+                for shm in handles:
+                    shm.close()
+                if metrics is not None:
+                    metrics.close()
+                remote.close()
+                break
+            elif cmd == "env_method":
+                index, name, args, kwargs = data
+                method = envs[index].get_wrapper_attr(name)
+                remote.send(method(*args, **kwargs))
+            elif cmd == "get_attr":
+                index, name = data
+                remote.send(envs[index].get_wrapper_attr(name))
+            elif cmd == "has_attr":
+                index, name = data
+                try:
+                    envs[index].get_wrapper_attr(name)
+                    remote.send(True)
+                except AttributeError:
+                    remote.send(False)
+            elif cmd == "set_attr":
+                index, name, value = data
+                remote.send(setattr(envs[index], name, value))
+            elif cmd == "is_wrapped":
+                index, wrapper_class = data
+                remote.send(is_wrapped(envs[index], wrapper_class))
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+        except EOFError:
+            break
+        except KeyboardInterrupt:
+            break
+
+class SharedMemoryVecEnv(VecEnv):
+    """
+    Drop-in replacement for SubprocVecEnv where each worker process hosts several envs.
+
+    Observations are written by the workers straight into one shared memory block per
+    observation key, so only actions, rewards, dones and infos go through the pipes.
+    Works with `make_vec_env(..., vec_env_cls=SharedMemoryVecEnv,
+    vec_env_kwargs={'envs_per_worker': M})`.
+
+    `worker_cores` pins worker i to core `worker_cores[i % len(worker_cores)]`, so
+    concurrent runs on one machine do not fight over the same cores.
+
+    Envs with `attach_metrics` (PokemonYellowEnv) write one record per finished episode
+    into `self.metrics`, an EpisodeMetricsRing with `metrics_capacity` records per env;
+    EpisodeMetricsCallback drains it.
+    """
+    def __init__(self, env_fns, envs_per_worker=1, start_method=None, worker_cores=None, metrics_capacity=1024):
+        self.waiting = False
+        self.closed = False
+        n_envs = len(env_fns)
+        self.envs_per_worker = envs_per_worker
+        n_workers = math.ceil(n_envs / envs_per_worker)
+
+        if start_method is None:
+            # Fork is not thread safe (see SubprocVecEnv), prefer forkserver when available
+            forkserver_available = "forkserver" in mp.get_all_start_methods()
+            start_method = "forkserver" if forkserver_available else "spawn"
+        ctx = mp.get_context(start_method)
+
+        # env index -> (worker, index inside that worker)
+        self.env_slots = [(i // envs_per_worker, i % envs_per_worker) for i in range(n_envs)]
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(n_workers)])
+        self.processes = []
+        for worker_idx, (work_remote, remote) in enumerate(zip(self.work_remotes, self.remotes)):
+            offset = worker_idx * envs_per_worker
+            chunk = env_fns[offset:offset + envs_per_worker]
+            core = worker_cores[worker_idx % len(worker_cores)] if worker_cores else None
+            args = (work_remote, remote, CloudpickleWrapper(chunk), offset, core)
+            # daemon=True: if the main process crashes, we should not cause things to hang
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        spaces_per_worker = [remote.recv() for remote in self.remotes]
+        observation_space, action_space = spaces_per_worker[0]
+        super().__init__(n_envs, observation_space, action_space)
+
+        # One shared block per observation key, indexed by env
+        self.keys, shapes, dtypes = obs_space_info(observation_space)
+        self.shms, self.buf_obs, shm_specs = [], {}, {}
+        for key in self.keys:
+            shape = (n_envs,) + tuple(shapes[key])
+            dtype = np.dtype(dtypes[key])
+            shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+            self.shms.append(shm)
+            self.buf_obs[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            shm_specs[key] = (shm.name, shape, dtype)
+        self.metrics = EpisodeMetricsRing(n_envs, metrics_capacity)
+        for remote in self.remotes:
+            remote.send(("attach", (shm_specs, self.metrics.spec())))
+        for remote in self.remotes:
+            remote.recv()
+
+    def _actions_per_worker(self, values):
+        per_worker = [[] for _ in self.remotes]
+        for (worker_idx, _), value in zip(self.env_slots, values):
+            per_worker[worker_idx].append(value)
+        return per_worker
+
+    def _obs_from_buf(self):
+        # Workers overwrite the shared block on the next step, hand out a copy
+        return dict_to_obs(self.observation_space, {key: np.copy(buf) for key, buf in self.buf_obs.items()})
+
+    def step_async(self, actions):
+        for remote, worker_actions in zip(self.remotes, self._actions_per_worker(actions)):
+            remote.send(("step", worker_actions))
+        self.waiting = True
+
+    def step_wait(self):
+        results = [remote.recv() for remote in self.remotes]
+        self.waiting = False
+        rewards, dones, infos, self.reset_infos = [], [], [], []
+        for worker_rewards, worker_dones, worker_infos, worker_reset_infos in results:
+            rewards.extend(worker_rewards)
+            dones.extend(worker_dones)
+            infos.extend(worker_infos)
+            self.reset_infos.extend(worker_reset_infos)
+        return self._obs_from_buf(), np.array(rewards, dtype=np.float32), np.array(dones, dtype=bool), infos
+
+    def reset(self):
+        requests = self._actions_per_worker(zip(self._seeds, self._options))
+        for remote, worker_requests in zip(self.remotes, requests):
+            remote.send(("reset", worker_requests))
+        self.reset_infos = []
+        for remote in self.remotes:
+            self.reset_infos.extend(remote.recv())
+        # Seeds and options are only used once
+        self._reset_seeds()
+        self._reset_options()
+        return self._obs_from_buf()
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.buf_obs = {}
+        for shm in self.shms:
+            shm.close()
+            shm.unlink()
+        self.metrics.close()
+        self.closed = True
+
+    def get_images(self):
+        for remote in self.remotes:
+            remote.send(("render", None))
+        images = []
+        for remote in self.remotes:
+            images.extend(remote.recv())
+        return images
+
+    def _call(self, cmd, indices, *args):
+        targets = [self.env_slots[i] for i in self._get_indices(indices)]
+        for worker_idx, local_idx in targets:
+            self.remotes[worker_idx].send((cmd, (local_idx,) + args))
+            # One request in flight per worker keeps replies in order
+            yield self.remotes[worker_idx].recv()
+
+    def has_attr(self, attr_name):
+        return all(self._call("has_attr", None, attr_name))
+
+    def get_attr(self, attr_name, indices=None):
+        return list(self._call("get_attr", indices, attr_name))
+
+    def set_attr(self, attr_name, value, indices=None):
+        list(self._call("set_attr", indices, attr_name, value))
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return list(self._call("env_method", indices, method_name, method_args, method_kwargs))
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return list(self._call("is_wrapped", indices, wrapper_class))
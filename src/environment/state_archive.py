@@ -0,0 +1,153 @@
+import os
+import re
+import zlib
+import numpy as np
+
+ENTRY_PATTERN = re.compile(r"m(\d+)_e(\d+)_d(\d+)\.state\.z$")
+
+class StateArchive:
+    """
+    Savestates captured at progress frontiers, zlib-compressed and keyed by (map_id, event_count).
+
+    Memory is capped at `max_bytes` of compressed data; when full, the entries with the
+    least story progress (lowest event count, then most sampled) are evicted first.
+
+    With a `directory`, every entry is also written there as one file (atomic rename).
+    That is how SubprocVecEnv workers share states, each one picks up the others' files
+    on `sync()`, and how the archive survives restarts.
+
+    Every worker holds its own in-memory copy, so a shared directory costs up to
+    N_workers * max_bytes of RAM in total. A worker only deletes the files it wrote
+    itself; entries it evicts that came from others stay on disk (their writer owns
+    them) and are remembered as evicted so `sync()` does not load them again. Files
+    left by earlier runs are trimmed by `prune_archive()`, which the process owning the
+    directory calls before starting its workers.
+    """
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024, compress_level=6):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self.entries = {}
+        self.evicted = {} # (map_id, event_count) -> dex count of the evicted entry
+        self.total_bytes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.sync()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def has(self, map_id, event_count, dex_count=0):
+        """True if an equal or better entry is stored, or was stored and evicted."""
+        entry = self.entries.get((map_id, event_count))
+        if entry is not None and entry['dex'] >= dex_count:
+            return True
+        return self.evicted.get((map_id, event_count), -1) >= dex_count
+
+    def add(self, state_bytes, map_id, event_count, dex_count):
+        """Stores a raw savestate. Returns False if an equal or better entry exists."""
+        if self.has(map_id, event_count, dex_count):
+            return False
+        compressed = zlib.compress(state_bytes, self.compress_level)
+        self._insert(map_id, event_count, dex_count, compressed, owned=True)
+        if self.directory:
+            path = os.path.join(self.directory, _filename(map_id, event_count, dex_count))
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp_path, path)
+        self._evict()
+        return True
+
+    def sample(self, rng):
+        """Returns a decompressed savestate, favouring advanced and rarely used entries."""
+        keys = list(self.entries)
+        events = np.array([key[1] for key in keys], dtype=np.float64)
+        samples = np.array([self.entries[key]['samples'] for key in keys], dtype=np.float64)
+        weights = (1.0 + events - events.min()) / np.sqrt(1.0 + samples)
+        key = keys[rng.choice(len(keys), p=weights / weights.sum())]
+        entry = self.entries[key]
+        entry['samples'] += 1
+        return zlib.decompress(entry['state'])
+
+    def sync(self):
+        """Loads entries other workers (or previous runs) wrote to the directory."""
+        if not self.directory:
+            return
+        for filename in os.listdir(self.directory):
+            match = ENTRY_PATTERN.match(filename)
+            if not match: continue
+            map_id, event_count, dex_count = (int(group) for group in match.groups())
+            if self.has(map_id, event_count, dex_count): continue
+            try:
+                with open(os.path.join(self.directory, filename), "rb") as f:
+                    compressed = f.read()
+            except FileNotFoundError:
+                continue # Evicted by its writer meanwhile
+            self._insert(map_id, event_count, dex_count, compressed, owned=False)
+        self._evict()
+
+    def _insert(self, map_id, event_count, dex_count, compressed, owned):
+        key = (map_id, event_count)
+        if key in self.entries:
+            self._remove(key) # Superseded by a higher dex count
+        self.entries[key] = {'state': compressed, 'dex': dex_count, 'samples': 0, 'owned': owned}
+        self.total_bytes += len(compressed)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.total_bytes -= len(entry['state'])
+        # Only the writer deletes the file: other workers may still have it indexed
+        if entry['owned'] and self.directory:
+            try:
+                os.remove(os.path.join(self.directory, _filename(key[0], key[1], entry['dex'])))
+            except FileNotFoundError:
+                pass
+        return entry
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key = min(self.entries, key=lambda k: (k[1], -self.entries[k]['samples']))
+            entry = self._remove(key)
+            self.evicted[key] = max(self.evicted.get(key, -1), entry['dex'])
+
+def _filename(map_id, event_count, dex_count):
+    return f"m{map_id:03d}_e{event_count:04d}_d{dex_count:03d}.state.z"
+
+def prune_archive(directory, max_bytes):
+    """
+    Disk retention for a shared archive directory, run by the process that owns it (e.g.
+    the trainer, before its workers start): drops entries superseded by a higher dex
+    count, then the least advanced ones until the files fit in `max_bytes`.
+    Returns the number of files removed.
+    """
+    if not os.path.isdir(directory):
+        return 0
+    best = {}
+    files = []
+    for filename in os.listdir(directory):
+        match = ENTRY_PATTERN.match(filename)
+        if not match: continue
+        map_id, event_count, dex_count = (int(group) for group in match.groups())
+        files.append((event_count, dex_count, map_id, filename))
+        best[(map_id, event_count)] = max(best.get((map_id, event_count), -1), dex_count)
+
+    removed = 0
+    kept, total_bytes = [], 0
+    for event_count, dex_count, map_id, filename in files:
+        path = os.path.join(directory, filename)
+        if dex_count < best[(map_id, event_count)]:
+            os.remove(path)
+            removed += 1
+        else:
+            size = os.path.getsize(path)
+            kept.append((event_count, dex_count, size, path))
+            total_bytes += size
+    kept.sort()
+    # Least advanced first; the most advanced entry is always kept
+    for event_count, dex_count, size, path in kept[:-1]:
+        if total_bytes <= max_bytes: break
+        os.remove(path)
+        total_bytes -= size
+        removed += 1
+    return removed
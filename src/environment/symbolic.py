@@ -0,0 +1,85 @@
+import numpy as np
+
+# --- EXTRA MEMORY ADDRESSES for the symbolic observation (wram.asm) ---
+MEM_PLAYER_FACING = 0xC109 # 0 down, 4 up, 8 left, 0xC right
+MEM_ENEMY_SPECIES = 0xCFE5
+MEM_ENEMY_HP_HIGH = 0xCFE6
+MEM_ENEMY_LEVEL = 0xCFF3
+MEM_IS_IN_BATTLE = 0xD057 # 0 none, 1 wild, 2 trainer, 0xFF lost
+MEM_PARTY_COUNT = 0xD163
+MEM_PARTY_SPECIES = 0xD164
+MEM_PARTY_MONS = 0xD16B # 6 structs of PARTY_MON_SIZE bytes
+MEM_POKEDEX_OWNED = 0xD2F7
+MEM_MAP_ID = 0xD35D
+MEM_Y_COORD = 0xD360
+MEM_X_COORD = 0xD361
+MEM_EVENT_FLAGS_START = 0xD747
+
+PARTY_MON_SIZE = 44
+PARTY_MON_HP = 1 # Offsets inside a party struct
+PARTY_MON_LEVEL = 33
+PARTY_MON_MAX_HP = 34
+EVENT_FLAG_BYTES = 320
+DEX_BYTES = 19
+
+# WRAM blocks the encoder reads (added to the env's RamSnapshot)
+SYMBOLIC_REGIONS = [
+    (MEM_PLAYER_FACING, MEM_PLAYER_FACING + 1),
+    (MEM_ENEMY_SPECIES, MEM_ENEMY_LEVEL + 1),
+    (MEM_IS_IN_BATTLE, MEM_IS_IN_BATTLE + 1),
+    (MEM_PARTY_COUNT, MEM_PARTY_MONS + 6 * PARTY_MON_SIZE),
+    (MEM_POKEDEX_OWNED, MEM_POKEDEX_OWNED + DEX_BYTES),
+    (MEM_MAP_ID, MEM_X_COORD + 1),
+    (MEM_EVENT_FLAGS_START, MEM_EVENT_FLAGS_START + EVENT_FLAG_BYTES),
+]
+
+# Vector layout: position (7) | party (25) | battle (6) | event flag bits | dex bits
+POSITION_SIZE = 3 + 4
+PARTY_SIZE = 1 + 6 * 4
+BATTLE_SIZE = 3 + 3
+EVENTS_OFFSET = POSITION_SIZE + PARTY_SIZE + BATTLE_SIZE
+DEX_OFFSET = EVENTS_OFFSET + EVENT_FLAG_BYTES * 8
+SYMBOLIC_SIZE = DEX_OFFSET + DEX_BYTES * 8
+
+# Bits of every byte value, least significant first (flag n = byte n // 8, bit n % 8)
+BITS_TABLE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder='little').astype(np.float32)
+
+def encode_symbolic(ram, out):
+    """Writes the normalized symbolic state decoded from a RamSnapshot into `out` (float32, SYMBOLIC_SIZE)."""
+    out[:EVENTS_OFFSET] = 0.0
+
+    # Position and facing
+    out[0] = ram.byte(MEM_X_COORD) / 255.0
+    out[1] = ram.byte(MEM_Y_COORD) / 255.0
+    out[2] = ram.byte(MEM_MAP_ID) / 255.0
+    out[3 + ((ram.byte(MEM_PLAYER_FACING) >> 2) & 3)] = 1.0
+
+    # Party: count, then species / level / HP fraction / max HP per slot
+    i = POSITION_SIZE
+    party_count = min(ram.byte(MEM_PARTY_COUNT), 6)
+    out[i] = party_count / 6.0
+    for slot in range(party_count):
+        base = MEM_PARTY_MONS + slot * PARTY_MON_SIZE
+        max_hp = ram.word(base + PARTY_MON_MAX_HP)
+        j = i + 1 + slot * 4
+        out[j] = ram.byte(MEM_PARTY_SPECIES + slot) / 255.0
+        out[j + 1] = min(ram.byte(base + PARTY_MON_LEVEL) / 100.0, 1.0)
+        out[j + 2] = ram.word(base + PARTY_MON_HP) / max_hp if max_hp else 0.0
+        out[j + 3] = min(max_hp / 700.0, 1.0)
+
+    # Battle: type one-hot (wild, trainer, lost) and enemy species / level / HP
+    i = POSITION_SIZE + PARTY_SIZE
+    battle = ram.byte(MEM_IS_IN_BATTLE)
+    if battle in (1, 2): out[i + battle - 1] = 1.0
+    elif battle == 0xFF: out[i + 2] = 1.0
+    if battle:
+        out[i + 3] = ram.byte(MEM_ENEMY_SPECIES) / 255.0
+        out[i + 4] = min(ram.byte(MEM_ENEMY_LEVEL) / 100.0, 1.0)
+        out[i + 5] = min(ram.word(MEM_ENEMY_HP_HIGH) / 700.0, 1.0)
+
+    # Event flag and dex bitfields, unpacked without temporaries
+    events = ram.view(MEM_EVENT_FLAGS_START, MEM_EVENT_FLAGS_START + EVENT_FLAG_BYTES)
+    np.take(BITS_TABLE, events, axis=0, out=out[EVENTS_OFFSET:DEX_OFFSET].reshape(EVENT_FLAG_BYTES, 8))
+    dex = ram.view(MEM_POKEDEX_OWNED, MEM_POKEDEX_OWNED + DEX_BYTES)
+    np.take(BITS_TABLE, dex, axis=0, out=out[DEX_OFFSET:].reshape(DEX_BYTES, 8))
+    return out
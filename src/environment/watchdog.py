@@ -0,0 +1,39 @@
+SIGNALS = ('events', 'maps', 'dex', 'tiles')
+
+class ProgressWatchdog:
+    """
+    Detects stuck episodes. Each signal ('events', 'maps', 'dex', 'tiles') has its own
+    window in steps; the episode counts as stalled once every watched signal has gone
+    longer than its window without novelty. Only the step of the last novelty per
+    signal is kept, so the state does not grow with episode length.
+
+    A window of None/0 leaves the signal out; no windows at all disables the watchdog.
+    """
+    def __init__(self, windows=None):
+        windows = windows or {}
+        unknown = set(windows) - set(SIGNALS)
+        if unknown:
+            raise ValueError(f"Unknown watchdog signals {sorted(unknown)}, expected some of {list(SIGNALS)}")
+        self.windows = {signal: window for signal, window in windows.items() if window}
+        self.last_novelty = dict.fromkeys(self.windows, 0)
+
+    @property
+    def enabled(self):
+        return bool(self.windows)
+
+    def reset(self):
+        for signal in self.last_novelty:
+            self.last_novelty[signal] = 0
+
+    def novelty(self, signal, step):
+        if signal in self.last_novelty:
+            self.last_novelty[signal] = step
+
+    def stalled(self, step):
+        """Returns {signal: steps without novelty} if every watched signal is stale, else None."""
+        if not self.windows:
+            return None
+        for signal, window in self.windows.items():
+            if step - self.last_novelty[signal] < window:
+                return None
+        return {signal: step - last for signal, last in self.last_novelty.items()}
@@ -0,0 +1,129 @@
+import json
+import warnings
+import time
+import numpy as np
+import torch as th
+from gymnasium import spaces
+from sb3_contrib import RecurrentPPO
+from stable_baselines3.common.preprocessing import is_image_space
+from src.inference.runner import META_FILE, PolicyRunner
+
+class ExportablePolicy(th.nn.Module):
+    """
+    The inference path of a RecurrentActorCriticPolicy as one traceable module:
+    observation preprocessing (uint8 screens / 255), features extractor (CNN + MLP),
+    actor LSTM and action head. Takes observations exactly as the env returns them
+    (channel-first screens), batched, plus the LSTM state and episode starts; returns
+    action logits and the new state.
+    """
+    def __init__(self, policy):
+        super().__init__()
+        if not isinstance(policy.action_space, spaces.Discrete):
+            raise ValueError(f"Only Discrete action spaces can be exported, got {policy.action_space}")
+        self.extractor = policy.pi_features_extractor
+        self.lstm = policy.lstm_actor
+        self.policy_net = policy.mlp_extractor.policy_net
+        self.action_net = policy.action_net
+        self.image_keys = []
+        for key, space in policy.observation_space.spaces.items():
+            if not isinstance(space, spaces.Box):
+                raise ValueError(f"Only Box observations can be exported, '{key}' is {space}")
+            if policy.normalize_images and is_image_space(space):
+                self.image_keys.append(key)
+        self.keys = list(policy.observation_space.spaces)
+
+    def forward(self, obs, h, c, episode_start):
+        processed = {}
+        for key in self.keys:
+            x = obs[key]
+            processed[key] = x.float() / 255.0 if key in self.image_keys else x.float()
+        features = self.extractor(processed)
+        # Same reset rule as SB3: zero the state of envs starting a new episode
+        keep = (1.0 - episode_start).view(1, -1, 1)
+        output, (h, c) = self.lstm(features.unsqueeze(0), (keep * h, keep * c))
+        logits = self.action_net(self.policy_net(output.squeeze(0)))
+        return logits, h, c
+
+def input_spec(policy):
+    """Per-key shape and dtype of the observations the export expects."""
+    return {key: {'shape': list(space.shape), 'dtype': space.dtype.name}
+            for key, space in policy.observation_space.spaces.items()}
+
+def example_inputs(meta, batch_size, rng=None):
+    """Random observations, zero LSTM state, random episode starts."""
+    rng = rng or np.random.default_rng(0)
+    obs = {}
+    for key, spec in meta['inputs'].items():
+        if np.dtype(spec['dtype']) == np.uint8:
+            obs[key] = rng.integers(0, 256, size=(batch_size, *spec['shape']), dtype=np.uint8)
+        else:
+            obs[key] = rng.random(size=(batch_size, *spec['shape'])).astype(spec['dtype'])
+    num_layers, hidden_size = meta['lstm']
+    return obs, np.zeros((num_layers, batch_size, hidden_size), dtype=np.float32), rng.random(batch_size) < 0.2
+
+def export_policy(model_path, output_path, freeze=True):
+    """
+    Loads a RecurrentPPO checkpoint and writes its policy as TorchScript (plus metadata
+    in the archive). Returns the loaded SB3 model, for `check_export`.
+    """
+    model = RecurrentPPO.load(model_path, device='cpu')
+    policy = model.policy
+    policy.set_training_mode(False)
+    module = ExportablePolicy(policy).eval()
+    meta = {'source': str(model_path), 'inputs': input_spec(policy),
+            'lstm': [policy.lstm_actor.num_layers, policy.lstm_actor.hidden_size],
+            'num_actions': int(policy.action_space.n)}
+
+    obs, state, starts = example_inputs(meta, batch_size=2)
+    example = ({key: th.from_numpy(value) for key, value in obs.items()}, th.from_numpy(state),
+               th.from_numpy(state.copy()), th.as_tensor(starts, dtype=th.float32))
+    with th.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning) # TorchScript deprecation notices (newer torch)
+        scripted = th.jit.trace(module, example)
+        if freeze:
+            # Folds parameters into the graph as constants (no autograd bookkeeping at runtime)
+            scripted = th.jit.freeze(scripted)
+        th.jit.save(scripted, output_path, _extra_files={META_FILE: json.dumps(meta)})
+    return model
+
+def check_export(model, exported_path, batch_sizes=(1, 8), steps=64, seed=0, tolerance=1e-4):
+    """
+    Runs SB3's policy and the exported runner side by side on random observations with
+    random episode starts, carrying the LSTM state across `steps` steps. Compares action
+    log-probabilities, argmax actions and LSTM states, and times one `predict` of each.
+    """
+    policy = model.policy
+    rng = np.random.default_rng(seed)
+    results = []
+    for batch_size in batch_sizes:
+        runner = PolicyRunner(exported_path, num_envs=batch_size)
+        state = None
+        max_diff, agree, sb3_time, runner_time = 0.0, 0, 0.0, 0.0
+        for _ in range(steps):
+            obs, zeros, starts = example_inputs(runner.meta, batch_size, rng)
+            previous = state or (zeros, zeros)
+
+            t0 = time.perf_counter()
+            actions, state = policy.predict(obs, state=previous, episode_start=starts, deterministic=True)
+            t1 = time.perf_counter()
+            runner_actions = runner.predict(obs, episode_start=starts, deterministic=True)
+            sb3_time += t1 - t0
+            runner_time += time.perf_counter() - t1
+
+            # Same step through SB3's distribution, for the log-probabilities
+            with th.no_grad():
+                obs_tensor, _ = policy.obs_to_tensor(obs)
+                distribution, _ = policy.get_distribution(
+                    obs_tensor, tuple(th.as_tensor(s, dtype=th.float32) for s in previous),
+                    th.as_tensor(starts, dtype=th.float32))
+                log_probs = distribution.distribution.logits.numpy()
+            runner_log_probs = th.log_softmax(runner.logits, dim=1).numpy()
+            max_diff = max(max_diff, float(np.abs(log_probs - runner_log_probs).max()),
+                           float(np.abs(state[0] - runner.h.numpy()).max()),
+                           float(np.abs(state[1] - runner.c.numpy()).max()))
+            agree += int(np.sum(actions == runner_actions))
+        results.append({'batch_size': batch_size, 'max_abs_diff': max_diff,
+                        'action_agreement': agree / (steps * batch_size),
+                        'sb3_ms': 1000.0 * sb3_time / steps, 'exported_ms': 1000.0 * runner_time / steps,
+                        'ok': max_diff < tolerance and agree == steps * batch_size})
+    return results
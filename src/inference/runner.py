@@ -0,0 +1,59 @@
+import json
+import warnings
+import numpy as np
+import torch as th
+
+META_FILE = "meta.json"
+
+class PolicyRunner:
+    """
+    Runs a policy exported with export_policy.py (TorchScript) without SB3 or the
+    training stack: batched CPU inference for `num_envs` envs, with the LSTM state kept
+    in preallocated tensors between calls.
+
+    `predict(obs, episode_start)` takes a dict of (num_envs, ...) arrays as the env
+    returns them (uint8 screens included) and returns one action per env.
+    """
+    def __init__(self, path, num_envs=1, num_threads=None):
+        if num_threads: th.set_num_threads(num_threads)
+        extra_files = {META_FILE: ""}
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', FutureWarning) # TorchScript deprecation notices (newer torch)
+            self.module = th.jit.load(path, map_location='cpu', _extra_files=extra_files)
+        self.module.eval()
+        self.meta = json.loads(extra_files[META_FILE])
+        self.keys = list(self.meta['inputs'])
+        self.num_envs = num_envs
+        num_layers, hidden_size = self.meta['lstm']
+        self.h = th.zeros((num_layers, num_envs, hidden_size))
+        self.c = th.zeros((num_layers, num_envs, hidden_size))
+        self.episode_start = th.ones(num_envs) # The first call starts every episode
+        self.logits = None
+
+    def reset(self, indices=None):
+        """Zeroes the LSTM state of `indices` (all envs by default)."""
+        if indices is None:
+            self.episode_start.fill_(1.0)
+        else:
+            self.episode_start[list(indices)] = 1.0
+
+    def predict(self, observation, episode_start=None, deterministic=True):
+        obs = {key: th.from_numpy(np.ascontiguousarray(observation[key])) for key in self.keys}
+        batch_size = obs[self.keys[0]].shape[0]
+        if batch_size != self.num_envs:
+            raise ValueError(f"Expected a batch of {self.num_envs} observations, got {batch_size}")
+        if episode_start is not None:
+            starts = th.from_numpy(np.asarray(episode_start, dtype=np.float32))
+            th.maximum(self.episode_start, starts, out=self.episode_start)
+
+        with th.inference_mode():
+            logits, h, c = self.module(obs, self.h, self.c, self.episode_start)
+            if deterministic:
+                actions = logits.argmax(dim=1)
+            else:
+                actions = th.multinomial(th.softmax(logits, dim=1), 1).squeeze(1)
+        self.h.copy_(h)
+        self.c.copy_(c)
+        self.episode_start.zero_()
+        self.logits = logits
+        return actions.numpy()
@@ -0,0 +1,207 @@
+import queue
+import time
+import numpy as np
+import torch as th
+from sb3_contrib.common.recurrent.type_aliases import RNNStates
+from stable_baselines3.common.utils import obs_as_tensor
+
+class PolicyWeights:
+    """
+    The learner's policy parameters as one flat float32 tensor in shared memory, plus a
+    version counter. The learner publishes after every update and actors pull only when
+    the version changed. A lock makes sure no actor copies a half-written vector.
+    """
+    def __init__(self, policy, ctx):
+        num_params = sum(param.numel() for param in policy.parameters())
+        self.buffer = th.zeros(num_params, dtype=th.float32).share_memory_()
+        self.version = ctx.Value('q', 0, lock=False)
+        self.lock = ctx.Lock()
+
+    def publish(self, policy):
+        flat = th.nn.utils.parameters_to_vector(policy.parameters()).detach().to('cpu', th.float32)
+        with self.lock:
+            self.buffer.copy_(flat)
+            self.version.value += 1
+        return self.version.value
+
+    def pull(self, policy, known_version):
+        """Loads the shared weights into `policy` if they are newer. Returns the version held."""
+        if self.version.value == known_version:
+            return known_version
+        with self.lock:
+            # Copy out first: vector_to_parameters would alias the shared buffer otherwise
+            flat = self.buffer.clone()
+            version = self.version.value
+        th.nn.utils.vector_to_parameters(flat, policy.parameters())
+        return version
+
+def make_policy(policy_class, observation_space, action_space, policy_kwargs):
+    # Inference-only copy: the optimizer lives in the learner
+    return policy_class(observation_space, action_space, lambda _: 0.0, **policy_kwargs)
+
+def terminal_value(policy, obs, lstm_states, index):
+    """V(s_T) of env `index`'s final observation, as RecurrentPPO computes it for timeouts."""
+    with th.no_grad():
+        obs_tensor = obs_as_tensor({key: value[None] for key, value in obs.items()}, policy.device)
+        state = (lstm_states.vf[0][:, index:index + 1].contiguous(), lstm_states.vf[1][:, index:index + 1].contiguous())
+        return policy.predict_values(obs_tensor, state, th.zeros(1)).item()
+
+def run_actor(actor_id, env_fn, num_envs, policy_class, policy_kwargs, weights, chunk_queue,
+              chunk_len, gamma, stop_event, seed=0):
+    """
+    Actor process: steps `num_envs` envs with a CPU copy of the policy and sends one chunk
+    per `chunk_len` steps. A chunk holds chunk_len + 1 observations (the last one
+    bootstraps the value), actions, rewards, dones, episode starts, behaviour log-probs,
+    the LSTM state at the chunk start and the policy version that produced it.
+
+    `dones` marks every episode boundary (the next observation belongs to a new episode).
+    Truncated episodes are not real ends: like SB3's PPO, their last reward gets
+    gamma * V(s_T) of the final observation added, so V-trace does not cut the value to 0.
+    """
+    th.set_num_threads(1) # Many actors per machine: no intra-op thread oversubscription
+    envs = [env_fn() for _ in range(num_envs)]
+    policy = make_policy(policy_class, envs[0].observation_space, envs[0].action_space, policy_kwargs)
+    policy.set_training_mode(False)
+    version = weights.pull(policy, -1)
+
+    observations = [env.reset(seed=seed + i)[0] for i, env in enumerate(envs)]
+    state_shape = (policy.lstm_hidden_state_shape[0], num_envs, policy.lstm_hidden_state_shape[2])
+    zeros = th.zeros(state_shape)
+    lstm_states = RNNStates((zeros, zeros.clone()), (zeros.clone(), zeros.clone()))
+    episode_starts = np.ones(num_envs, dtype=bool)
+    episode_returns = np.zeros(num_envs)
+    episode_lengths = np.zeros(num_envs, dtype=np.int64)
+    obs_space = envs[0].observation_space.spaces
+    blocked_time = 0.0
+
+    while not stop_event.is_set():
+        version = weights.pull(policy, version)
+        t_start = time.perf_counter()
+        chunk = {
+            'obs': {key: np.empty((num_envs, chunk_len + 1, *space.shape), dtype=space.dtype)
+                    for key, space in obs_space.items()},
+            'actions': np.empty((num_envs, chunk_len), dtype=np.int64),
+            'rewards': np.empty((num_envs, chunk_len), dtype=np.float32),
+            'dones': np.empty((num_envs, chunk_len), dtype=bool),
+            'episode_starts': np.empty((num_envs, chunk_len + 1), dtype=bool),
+            'log_probs': np.empty((num_envs, chunk_len), dtype=np.float32),
+            'lstm_states': tuple(state.numpy().copy() for pair in lstm_states for state in pair),
+            'version': version, 'actor': actor_id, 'episodes': [],
+        }
+        for t in range(chunk_len + 1):
+            for key, buffer in chunk['obs'].items():
+                for i, obs in enumerate(observations):
+                    buffer[i, t] = obs[key] # Copies now: envs reuse their obs buffers
+            chunk['episode_starts'][:, t] = episode_starts
+            if t == chunk_len: break
+
+            with th.no_grad():
+                obs_tensor = obs_as_tensor({key: buffer[:, t] for key, buffer in chunk['obs'].items()}, policy.device)
+                actions, _, log_probs, lstm_states = policy.forward(
+                    obs_tensor, lstm_states, th.as_tensor(episode_starts, dtype=th.float32))
+            actions = actions.numpy()
+            chunk['actions'][:, t] = actions
+            chunk['log_probs'][:, t] = log_probs.numpy()
+
+            for i, env in enumerate(envs):
+                obs, reward, terminated, truncated, _ = env.step(int(actions[i]))
+                done = terminated or truncated
+                episode_returns[i] += reward
+                episode_lengths[i] += 1
+                if done:
+                    chunk['episodes'].append({'r': float(episode_returns[i]), 'l': int(episode_lengths[i])})
+                    episode_returns[i] = 0.0
+                    episode_lengths[i] = 0
+                    if truncated and not terminated:
+                        # max_steps / watchdog cut: bootstrap from the final observation
+                        reward += gamma * terminal_value(policy, obs, lstm_states, i)
+                    obs, _ = env.reset()
+                observations[i] = obs
+                chunk['rewards'][i, t] = reward
+                chunk['dones'][i, t] = done
+                episode_starts[i] = done
+
+        # Utilization: time spent stepping vs. waiting on a full queue (measured on the previous put)
+        chunk['busy_time'] = time.perf_counter() - t_start
+        chunk['blocked_time'] = blocked_time
+        t_put = time.perf_counter()
+        while not stop_event.is_set():
+            try:
+                chunk_queue.put(chunk, timeout=1.0)
+                break
+            except queue.Full:
+                continue
+        blocked_time = time.perf_counter() - t_put
+    for env in envs:
+        env.close()
+
+def collate(chunks, device):
+    """Stacks chunks along the sequence axis and flattens to SB3's sequence-major layout."""
+    def flat(array):
+        return array.reshape(-1, *array.shape[2:])
+    obs = {key: flat(np.concatenate([chunk['obs'][key] for chunk in chunks])) for key in chunks[0]['obs']}
+    batch = {key: np.concatenate([chunk[key] for chunk in chunks])
+             for key in ('actions', 'rewards', 'dones', 'episode_starts', 'log_probs')}
+    lstm = [th.as_tensor(np.concatenate([chunk['lstm_states'][i] for chunk in chunks], axis=1), device=device)
+            for i in range(4)]
+    num_seq, seq_len = batch['actions'].shape
+    # Dummy action for the bootstrap observation (its log-prob is discarded)
+    actions = np.concatenate([batch['actions'], np.zeros((num_seq, 1), dtype=np.int64)], axis=1)
+    return {
+        'obs': obs_as_tensor(obs, device),
+        'actions': th.as_tensor(actions.reshape(-1), device=device),
+        'episode_starts': th.as_tensor(batch['episode_starts'].reshape(-1), dtype=th.float32, device=device),
+        'lstm_states': RNNStates((lstm[0], lstm[1]), (lstm[2], lstm[3])),
+        'rewards': th.as_tensor(batch['rewards'], device=device),
+        'dones': th.as_tensor(batch['dones'], dtype=th.float32, device=device),
+        'behaviour_log_probs': th.as_tensor(batch['log_probs'], device=device),
+        'shape': (num_seq, seq_len),
+    }
+
+def vtrace(log_rhos, rewards, dones, values, bootstrap, gamma, rho_clip=1.0, c_clip=1.0):
+    """
+    V-trace targets (Espeholt et al., 2018) for (num_seq, seq_len) tensors.
+    Returns (vs, pg_advantages), both without gradient.
+    """
+    with th.no_grad():
+        rhos = th.exp(log_rhos)
+        clipped_rhos = th.clamp(rhos, max=rho_clip)
+        cs = th.clamp(rhos, max=c_clip)
+        discounts = gamma * (1.0 - dones)
+        next_values = th.cat([values[:, 1:], bootstrap.unsqueeze(1)], dim=1)
+        deltas = clipped_rhos * (rewards + discounts * next_values - values)
+
+        corrections = th.zeros_like(values)
+        acc = th.zeros_like(bootstrap)
+        for t in reversed(range(values.shape[1])):
+            acc = deltas[:, t] + discounts[:, t] * cs[:, t] * acc
+            corrections[:, t] = acc
+        vs = values + corrections
+        next_vs = th.cat([vs[:, 1:], bootstrap.unsqueeze(1)], dim=1)
+        pg_advantages = clipped_rhos * (rewards + discounts * next_vs - values)
+    return vs, pg_advantages
+
+def learner_update(policy, batch, gamma, ent_coef, vf_coef, max_grad_norm):
+    """One off-policy actor-critic update (V-trace corrected) on a collated batch."""
+    num_seq, seq_len = batch['shape']
+    values, log_probs, entropy = policy.evaluate_actions(
+        batch['obs'], batch['actions'], batch['lstm_states'], batch['episode_starts'])
+    values = values.reshape(num_seq, seq_len + 1)
+    log_probs = log_probs.reshape(num_seq, seq_len + 1)[:, :-1]
+    entropy = entropy.reshape(num_seq, seq_len + 1)[:, :-1]
+
+    log_rhos = log_probs.detach() - batch['behaviour_log_probs']
+    vs, advantages = vtrace(log_rhos, batch['rewards'], batch['dones'],
+                            values[:, :-1].detach(), values[:, -1].detach(), gamma)
+
+    policy_loss = -(advantages * log_probs).mean()
+    value_loss = 0.5 * ((vs - values[:, :-1]) ** 2).mean()
+    entropy_loss = -entropy.mean()
+    loss = policy_loss + vf_coef * value_loss + ent_coef * entropy_loss
+
+    policy.optimizer.zero_grad()
+    loss.backward()
+    th.nn.utils.clip_grad_norm_(policy.parameters(), max_grad_norm)
+    policy.optimizer.step()
+    return {'policy_loss': policy_loss.item(), 'value_loss': value_loss.item(),
+            'entropy_loss': entropy_loss.item(), 'mean_rho': th.exp(log_rhos).mean().item()}
@@ -0,0 +1,112 @@
+import zlib
+import numpy as np
+from sb3_contrib.common.recurrent.buffers import RecurrentDictRolloutBuffer
+
+class DedupRecurrentDictRolloutBuffer(RecurrentDictRolloutBuffer):
+    """
+    RecurrentDictRolloutBuffer that stores every distinct frame of the `dedup_keys`
+    observations (the screen by default) once.
+
+    Each step keeps only an index into a per-key frame store. Frames are found by
+    content hash (CRC32 over the frame's buffer) and compared byte by byte against every
+    frame in the bucket, so colliding frames are neither mixed up nor stored twice.
+    Minibatches gather their frames from the store when sampled. The store grows by
+    doubling and is reused across rollouts, so it stays near the peak number of unique
+    frames per rollout instead of n_steps * n_envs.
+    """
+    def __init__(self, *args, dedup_keys=('screen',), **kwargs):
+        self.dedup_keys = tuple(dedup_keys)
+        self.frames = {}
+        self.num_frames = {}
+        super().__init__(*args, **kwargs)
+
+    def reset(self):
+        # Deduplicated keys get no dense (n_steps, n_envs, *shape) array
+        obs_shape = self.obs_shape
+        self.obs_shape = {key: shape for key, shape in obs_shape.items() if key not in self.dedup_keys}
+        super().reset()
+        self.obs_shape = obs_shape
+
+        self.frame_ids = {key: np.zeros((self.buffer_size, self.n_envs), dtype=np.int64) for key in self.dedup_keys}
+        self.frame_lookup = {key: {} for key in self.dedup_keys}
+        for key in self.dedup_keys:
+            if key not in self.frames:
+                self.frames[key] = np.empty((self.n_envs, *obs_shape[key]), dtype=self.observation_space[key].dtype)
+            self.num_frames[key] = 0
+
+    def add(self, obs, *args, **kwargs):
+        for key in self.dedup_keys:
+            frames = obs[key]
+            for env_idx in range(self.n_envs):
+                self.frame_ids[key][self.pos, env_idx] = self._store_frame(key, frames[env_idx])
+        super().add(obs, *args, **kwargs)
+
+    def _store_frame(self, key, frame):
+        lookup = self.frame_lookup[key]
+        store = self.frames[key]
+        # CRC straight over the array's buffer: no bytes copy of the frame per step
+        digest = zlib.crc32(np.ascontiguousarray(frame))
+        candidates = lookup.get(digest)
+        if candidates is None:
+            candidates = lookup[digest] = []
+        for frame_id in candidates: # More than one only on a hash collision
+            if np.array_equal(store[frame_id], frame):
+                return frame_id
+
+        frame_id = self.num_frames[key]
+        if frame_id == len(store):
+            grown = np.empty((2 * len(store), *store.shape[1:]), dtype=store.dtype)
+            grown[:frame_id] = store
+            store = self.frames[key] = grown
+        store[frame_id] = frame
+        self.num_frames[key] = frame_id + 1
+        candidates.append(frame_id)
+        return frame_id
+
+    def get(self, batch_size=None):
+        if not self.generator_ready:
+            for key in self.dedup_keys:
+                self.frame_ids[key] = self.swap_and_flatten(self.frame_ids[key])
+        yield from super().get(batch_size)
+
+    def _get_samples(self, batch_inds, env_change, env=None):
+        samples = super()._get_samples(batch_inds, env_change, env)
+        for key in self.dedup_keys:
+            frames = self.frames[key][self.frame_ids[key][batch_inds]]
+            padded = self.pad(frames)
+            samples.observations[key] = padded.reshape((-1,) + self.obs_shape[key])
+        return samples
+
+    def memory_stats(self):
+        """Unique frames and bytes stored vs. what a dense buffer would hold, per key."""
+        stats = {}
+        steps = (self.buffer_size if self.full else self.pos) * self.n_envs
+        for key in self.dedup_keys:
+            store = self.frames[key]
+            frame_bytes = store[0].nbytes
+            unique = self.num_frames[key]
+            stats[key] = {
+                'unique_frames': unique,
+                'dedup_ratio': steps / unique if unique else 1.0,
+                'stored_mb': unique * frame_bytes / 1e6,
+                'allocated_mb': store.nbytes / 1e6,
+                'dense_mb': self.buffer_size * self.n_envs * frame_bytes / 1e6,
+            }
+        return stats
+
+def use_dedup_buffer(model, dedup_keys=('screen',)):
+    """Swaps a RecurrentPPO model's rollout buffer for the deduplicating one (call before learn)."""
+    old = model.rollout_buffer
+    dedup_keys = [key for key in dedup_keys if key in model.observation_space.spaces]
+    model.rollout_buffer = DedupRecurrentDictRolloutBuffer(
+        old.buffer_size,
+        model.observation_space,
+        model.action_space,
+        old.hidden_state_shape,
+        model.device,
+        gamma=model.gamma,
+        gae_lambda=model.gae_lambda,
+        n_envs=model.n_envs,
+        dedup_keys=dedup_keys,
+    )
+    return model
@@ -0,0 +1,153 @@
+import json
+import os
+import time
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+from src.environment.metrics import END_REASONS, EPISODE_DTYPE, START_KINDS
+from src.training.checkpoints import AsyncCheckpointer
+
+class ThroughputCallback(BaseCallback):
+    """
+    Logs env throughput to TensorBoard at the end of every rollout:
+
+    - perf/steps_per_sec: env steps per wall-clock second, training phase included
+    - perf/collect_steps_per_sec: env steps per second while collecting the rollout
+    - perf/frames_per_sec: emulated frames per second (from the workers' reports)
+    - perf/share_<phase>: fraction of worker time spent in each step() phase
+    - perf/share_idle: worker time outside step() (pipe/IPC, policy inference, training)
+
+    Phase timings come from the env's `info['perf']` reports (see StepProfiler).
+    With `status_path` the latest numbers are also written there as JSON (read by scheduler.py).
+    """
+    def __init__(self, status_path=None, verbose=0):
+        super().__init__(verbose)
+        self.status_path = status_path
+        self.phases = {}
+        self.worker_elapsed = 0.0
+        self.report_steps = 0
+        self.report_frames = 0
+        self.last_time = None
+        self.last_timesteps = 0
+        self.rollout_start = None
+        self.rollout_start_timesteps = 0
+
+    def _on_training_start(self):
+        self.last_time = time.perf_counter()
+        self.last_timesteps = self.num_timesteps
+
+    def _on_rollout_start(self):
+        self.rollout_start = time.perf_counter()
+        self.rollout_start_timesteps = self.num_timesteps
+
+    def _on_step(self):
+        for info in self.locals.get('infos', []):
+            report = info.get('perf')
+            if report is None: continue
+            self.report_steps += report['steps']
+            self.report_frames += report['frames']
+            self.worker_elapsed += report['elapsed']
+            for phase, seconds in report['phases'].items():
+                self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        return True
+
+    def _on_rollout_end(self):
+        now = time.perf_counter()
+        steps_per_sec = (self.num_timesteps - self.last_timesteps) / (now - self.last_time)
+        self.logger.record('perf/steps_per_sec', steps_per_sec)
+        self.logger.record('perf/collect_steps_per_sec',
+                           (self.num_timesteps - self.rollout_start_timesteps) / (now - self.rollout_start))
+        self.last_time = now
+        self.last_timesteps = self.num_timesteps
+        if self.status_path is not None:
+            self._write_status(steps_per_sec)
+
+        if self.worker_elapsed > 0:
+            self.logger.record('perf/frames_per_sec', steps_per_sec * self.report_frames / self.report_steps)
+            busy = 0.0
+            for phase, seconds in self.phases.items():
+                self.logger.record(f'perf/share_{phase}', seconds / self.worker_elapsed)
+                busy += seconds
+            self.logger.record('perf/share_idle', max(0.0, 1.0 - busy / self.worker_elapsed))
+            self.phases = {}
+            self.worker_elapsed = 0.0
+            self.report_steps = 0
+            self.report_frames = 0
+
+    def _write_status(self, steps_per_sec):
+        status = {'num_timesteps': int(self.num_timesteps), 'steps_per_sec': steps_per_sec,
+                  'updated': time.time()}
+        with open(f"{self.status_path}.tmp", "w") as f:
+            json.dump(status, f)
+        os.replace(f"{self.status_path}.tmp", self.status_path)
+
+class RolloutMemoryCallback(BaseCallback):
+    """
+    Logs the rollout buffer's frame storage at the end of every rollout (buffers with
+    `memory_stats()`, e.g. DedupRecurrentDictRolloutBuffer):
+
+    - memory/<key>_unique_frames, memory/<key>_dedup_ratio
+    - memory/<key>_stored_mb, memory/<key>_allocated_mb, memory/<key>_dense_mb
+    """
+    def _on_step(self):
+        return True
+
+    def _on_rollout_end(self):
+        memory_stats = getattr(self.model.rollout_buffer, 'memory_stats', None)
+        if memory_stats is None: return
+        for key, stats in memory_stats().items():
+            for name, value in stats.items():
+                self.logger.record(f'memory/{key}_{name}', value)
+
+class EpisodeMetricsCallback(BaseCallback):
+    """
+    Drains the vec env's episode metrics ring (SharedMemoryVecEnv.metrics) at the end of
+    every rollout and logs the episodes finished since the last drain:
+
+    - episodes/<field>_mean and a histogram episodes/<field> per record field
+      (length, reward, events, maps, dex, tiles, skipped_frames, reward_<component>)
+    - episodes/anti_rock_bonus, episodes/end_<reason>, episodes/start_<kind>: share of episodes
+    - episodes/count, episodes/dropped (records lost to a full ring since the start)
+
+    TensorBoard only: nothing goes to stdout.
+    """
+    def _on_step(self):
+        return True
+
+    def _on_rollout_end(self):
+        ring = getattr(self.training_env, 'metrics', None)
+        if ring is None: return
+        records, dropped = ring.drain()
+        exclude = ('stdout', 'log', 'json', 'csv')
+        self.logger.record('episodes/dropped', dropped, exclude=exclude)
+        if not len(records): return
+        self.logger.record('episodes/count', len(records), exclude=exclude)
+        for field in EPISODE_DTYPE.names:
+            if field in ('end_reason', 'start', 'anti_rock_bonus'): continue
+            values = records[field].astype(np.float32)
+            self.logger.record(f'episodes/{field}_mean', float(values.mean()), exclude=exclude)
+            self.logger.record(f'episodes/{field}', values, exclude=exclude)
+        self.logger.record('episodes/anti_rock_bonus', float(records['anti_rock_bonus'].mean()), exclude=exclude)
+        for i, reason in enumerate(END_REASONS):
+            self.logger.record(f'episodes/end_{reason}', float(np.mean(records['end_reason'] == i)), exclude=exclude)
+        for i, kind in enumerate(START_KINDS):
+            self.logger.record(f'episodes/start_{kind}', float(np.mean(records['start'] == i)), exclude=exclude)
+
+class AsyncCheckpointCallback(BaseCallback):
+    """
+    Drop-in replacement for CheckpointCallback: every `save_freq` calls the model is
+    snapshotted in memory and an AsyncCheckpointer writes it in the background with
+    retention (last `keep_last` + best `keep_best` by mean reward) and a latest.json
+    manifest. Logs checkpoint/snapshot_ms and checkpoint/skipped.
+    """
+    def __init__(self, save_freq, save_path, name_prefix="rl_model", keep_last=3, keep_best=1, verbose=0):
+        super().__init__(verbose)
+        self.save_freq = save_freq
+        self.checkpointer = AsyncCheckpointer(save_path, name_prefix, keep_last, keep_best, verbose)
+
+    def _on_step(self):
+        if self.n_calls % self.save_freq == 0:
+            t0 = time.perf_counter()
+            self.checkpointer.save(self.model)
+            self.logger.record('checkpoint/snapshot_ms', (time.perf_counter() - t0) * 1000.0)
+            self.logger.record('checkpoint/skipped', self.checkpointer.skipped)
+        return True
@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+import zipfile
+import stable_baselines3 as sb3
+import torch as th
+from stable_baselines3.common.save_util import data_to_json
+from stable_baselines3.common.utils import get_system_info, safe_mean
+
+MANIFEST_FILE = "latest.json"
+
+def clone_to_cpu(value):
+    """Deep copy of a (nested) state_dict with every tensor detached and moved to CPU."""
+    if isinstance(value, th.Tensor):
+        return value.detach().to('cpu', copy=True)
+    if isinstance(value, dict):
+        return {key: clone_to_cpu(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(clone_to_cpu(item) for item in value)
+    return value
+
+def snapshot_model(model):
+    """
+    In-memory copy of everything `model.save()` writes (same exclusions, same zip entries):
+    the serialized data JSON plus CPU clones of the state_dicts. Safe to write from
+    another thread while training keeps updating the live parameters.
+    """
+    data = model.__dict__.copy()
+    exclude = set(model._excluded_save_params())
+    state_dicts_names, torch_variable_names = model._get_torch_save_params()
+    for torch_var in state_dicts_names + torch_variable_names:
+        exclude.add(torch_var.split(".")[0])
+    for param_name in exclude:
+        data.pop(param_name, None)
+
+    pytorch_variables = None
+    if torch_variable_names is not None:
+        pytorch_variables = {}
+        for name in torch_variable_names:
+            attr = model
+            for part in name.split("."): attr = getattr(attr, part)
+            pytorch_variables[name] = clone_to_cpu(attr)
+
+    return {'data': data_to_json(data),
+            'params': clone_to_cpu(model.get_parameters()),
+            'pytorch_variables': pytorch_variables}
+
+def write_snapshot(snapshot, path):
+    """Writes a snapshot as a regular SB3 zip (loadable with RecurrentPPO.load), atomically."""
+    tmp_path = f"{path}.tmp"
+    with zipfile.ZipFile(tmp_path, mode="w") as archive:
+        archive.writestr("data", snapshot['data'])
+        if snapshot['pytorch_variables'] is not None:
+            with archive.open("pytorch_variables.pth", mode="w", force_zip64=True) as f:
+                th.save(snapshot['pytorch_variables'], f)
+        for file_name, state_dict in snapshot['params'].items():
+            with archive.open(file_name + ".pth", mode="w", force_zip64=True) as f:
+                th.save(state_dict, f)
+        archive.writestr("_stable_baselines3_version", sb3.__version__)
+        archive.writestr("system_info.txt", get_system_info(print_info=False)[1])
+    os.replace(tmp_path, path)
+
+class AsyncCheckpointer:
+    """
+    Writes model snapshots on a background thread and prunes the checkpoint directory.
+
+    Retention: the `keep_last` newest checkpoints plus the `keep_best` with the highest
+    mean episode reward are kept, older ones are deleted. `<save_path>/latest.json` names
+    the newest checkpoint (plus the retained list), so readers poll one small file
+    instead of scanning the directory. If a write is still running when the next
+    snapshot arrives, the pending (unwritten) one is replaced by the newer one.
+    """
+    def __init__(self, save_path, name_prefix="model", keep_last=3, keep_best=1, verbose=0):
+        self.save_path = save_path
+        self.name_prefix = name_prefix
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.verbose = verbose
+        self.checkpoints = [] # [{'path', 'num_timesteps', 'mean_reward'}], oldest first
+        self.latest = None
+        self.skipped = 0
+        self.pending = None
+        self.busy = False
+        self.closed = False
+        self.condition = threading.Condition()
+        os.makedirs(save_path, exist_ok=True)
+
+        manifest_path = os.path.join(save_path, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            # Resume retention where the previous run left off
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            self.checkpoints = [c for c in manifest.get('checkpoints', []) if os.path.exists(c['path'])]
+            self.latest = manifest.get('latest')
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def save(self, model, path=None, retain=True, wait=False):
+        """
+        Snapshots the model now (training thread) and queues the write. `path=None` names
+        it after num_timesteps; `retain=False` keeps it out of the retention policy
+        (e.g. the final model). `wait=True` blocks until it is on disk.
+        """
+        mean_reward = None
+        if model.ep_info_buffer:
+            mean_reward = float(safe_mean([ep_info["r"] for ep_info in model.ep_info_buffer]))
+        if path is None:
+            path = os.path.join(self.save_path, f"{self.name_prefix}_{model.num_timesteps}_steps.zip")
+        job = {'snapshot': snapshot_model(model), 'path': path, 'retain': retain,
+               'num_timesteps': int(model.num_timesteps), 'mean_reward': mean_reward}
+        with self.condition:
+            if self.pending is not None:
+                self.skipped += 1
+            self.pending = job
+            self.condition.notify_all()
+        if wait:
+            self.flush()
+
+    def flush(self):
+        """Blocks until every queued snapshot has been written."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.pending is None and not self.busy)
+
+    def close(self):
+        self.flush()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending is not None or self.closed)
+                if self.pending is None: return
+                job, self.pending = self.pending, None
+                self.busy = True
+            try:
+                t0 = time.perf_counter()
+                write_snapshot(job['snapshot'], job['path'])
+                if self.verbose:
+                    print(f"💾 Checkpoint guardado: {job['path']} ({time.perf_counter() - t0:.1f}s)")
+                self._commit(job)
+            except Exception as e:
+                print(f"⚠️ Error guardando checkpoint {job['path']}: {e}")
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+
+    def _commit(self, job):
+        entry = {'path': job['path'], 'num_timesteps': job['num_timesteps'], 'mean_reward': job['mean_reward']}
+        if job['retain']:
+            self.checkpoints = [c for c in self.checkpoints if c['path'] != job['path']] + [entry]
+            self._apply_retention()
+        self.latest = entry
+        self._write_manifest()
+
+    def _apply_retention(self):
+        keep = {c['path'] for c in self.checkpoints[-self.keep_last:]} if self.keep_last else set()
+        rated = [c for c in self.checkpoints if c['mean_reward'] is not None]
+        rated.sort(key=lambda c: c['mean_reward'], reverse=True)
+        keep.update(c['path'] for c in rated[:self.keep_best])
+        for checkpoint in self.checkpoints:
+            if checkpoint['path'] not in keep:
+                try:
+                    os.remove(checkpoint['path'])
+                except FileNotFoundError:
+                    pass
+        self.checkpoints = [c for c in self.checkpoints if c['path'] in keep]
+
+    def _write_manifest(self):
+        best = max((c for c in self.checkpoints if c['mean_reward'] is not None),
+                   key=lambda c: c['mean_reward'], default=None)
+        manifest = {'latest': self.latest, 'best': best, 'checkpoints': self.checkpoints,
+                    'updated': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        path = os.path.join(self.save_path, MANIFEST_FILE)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{path}.tmp", path)
@@ -0,0 +1,231 @@
+import json
+import os
+import queue
+import threading
+import uuid
+import gymnasium as gym
+import numpy as np
+
+INDEX_FILE = "index.json"
+
+class TrajectoryDatasetWriter:
+    """
+    Streams transitions into chunked, memory-mapped .npy files for offline pretraining.
+
+    Layout: `<directory>/chunk_00000/<field>.npy` (one file per observation key plus
+    `action`, `reward` and `done`), each chunk preallocated for `chunk_steps` rows, and
+    `<directory>/index.json` listing the finished chunks and how many rows they hold.
+    The index is rewritten (atomic rename) every time a chunk is completed, so readers
+    can train on a dataset that is still being written.
+
+    One writer per stream of consecutive steps (e.g. one per env), each in its own directory.
+    """
+    def __init__(self, directory, observation_space, chunk_steps=8192):
+        self.directory = directory
+        self.chunk_steps = chunk_steps
+        self.fields = {key: (space.shape, space.dtype.str) for key, space in observation_space.spaces.items()}
+        self.fields['action'] = ((), np.dtype(np.int64).str)
+        self.fields['reward'] = ((), np.dtype(np.float32).str)
+        self.fields['done'] = ((), np.dtype(bool).str)
+        self.chunks = []
+        self.arrays = None
+        self.length = 0
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, INDEX_FILE)):
+            with open(os.path.join(directory, INDEX_FILE)) as f:
+                self.chunks = json.load(f)['chunks'] # Appending to an existing dataset
+
+    def append(self, obs, action, reward, done):
+        if self.arrays is None:
+            self._open_chunk()
+        row = self.length
+        for key, array in self.arrays.items():
+            if key in obs: array[row] = obs[key]
+        self.arrays['action'][row] = action
+        self.arrays['reward'][row] = reward
+        self.arrays['done'][row] = done
+        self.length += 1
+        if self.length == self.chunk_steps:
+            self._close_chunk()
+
+    def _open_chunk(self):
+        name = f"chunk_{len(self.chunks):05d}"
+        os.makedirs(os.path.join(self.directory, name), exist_ok=True)
+        self.arrays = {
+            key: np.lib.format.open_memmap(os.path.join(self.directory, name, f"{key}.npy"), mode='w+',
+                                           dtype=np.dtype(dtype), shape=(self.chunk_steps, *shape))
+            for key, (shape, dtype) in self.fields.items()
+        }
+        self.chunk_name = name
+        self.length = 0
+
+    def _close_chunk(self):
+        for array in self.arrays.values():
+            array.flush()
+        self.chunks.append({'name': self.chunk_name, 'length': self.length})
+        self.arrays = None
+        self._write_index()
+
+    def _write_index(self):
+        index = {'fields': {key: {'shape': list(shape), 'dtype': dtype} for key, (shape, dtype) in self.fields.items()},
+                 'chunks': self.chunks}
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def close(self):
+        if self.arrays is not None and self.length:
+            self._close_chunk()
+
+class DatasetRecorder(gym.Wrapper):
+    """Records every transition of an env (agent or human driven) with a TrajectoryDatasetWriter."""
+    def __init__(self, env, directory, chunk_steps=8192):
+        super().__init__(env)
+        # Own subdirectory per env instance, so vectorized workers never share files
+        self.writer = TrajectoryDatasetWriter(os.path.join(directory, f"{os.getpid()}_{uuid.uuid4().hex[:6]}"),
+                                              env.observation_space, chunk_steps)
+        self.last_obs = None
+
+    def reset(self, **kwargs):
+        obs, info = self.env.reset(**kwargs)
+        self.last_obs = self._copy(obs)
+        return obs, info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        self.writer.append(self.last_obs, action, reward, terminated or truncated)
+        self.last_obs = self._copy(obs)
+        return obs, reward, terminated, truncated, info
+
+    @staticmethod
+    def _copy(obs):
+        # Kept across the next step(): must not alias buffers the env reuses
+        return {key: np.array(value) for key, value in obs.items()}
+
+    def close(self):
+        self.writer.close()
+        return super().close()
+
+class SequenceDataset:
+    """
+    Shuffled fixed-length sequences from one or more dataset directories (searched
+    recursively for index.json), for training recurrent policies offline.
+
+    Chunks are opened with mmap and never loaded whole: each batch copies only its rows
+    from the page cache into a fresh (batch, seq_len, ...) array, so datasets larger
+    than RAM stream at disk speed. `num_workers` threads assemble batches ahead of the
+    consumer (up to `prefetch` batches); numpy releases the GIL while copying. With
+    `num_workers=0` batches are loaded inline, in the consumer's thread.
+
+    Batches are dicts with every stored field plus `episode_start` (True at the first
+    step of each sequence and after every `done`), matching what the LSTM expects.
+    """
+    def __init__(self, paths, seq_len=64, batch_size=32, fields=None, shuffle=True,
+                 seed=None, num_workers=2, prefetch=4):
+        if isinstance(paths, str): paths = [paths]
+        if num_workers < 0:
+            raise ValueError(f"num_workers must be >= 0, got {num_workers}")
+        if num_workers and prefetch < 1:
+            raise ValueError(f"prefetch must be >= 1 with background workers, got {prefetch}")
+        self.seq_len = seq_len
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.num_workers = num_workers
+        self.prefetch = prefetch
+        self.rng = np.random.default_rng(seed)
+
+        self.chunks = [] # One dict of read-only memmaps per chunk
+        starts = []
+        for index_dir in self._find_datasets(paths):
+            with open(os.path.join(index_dir, INDEX_FILE)) as f:
+                index = json.load(f)
+            keys = fields or list(index['fields'])
+            if 'done' not in keys: keys = keys + ['done']
+            for chunk in index['chunks']:
+                arrays = {key: np.load(os.path.join(index_dir, chunk['name'], f"{key}.npy"), mmap_mode='r')
+                          for key in keys}
+                # Non-overlapping windows inside the chunk's written rows
+                for start in range(0, chunk['length'] - seq_len + 1, seq_len):
+                    starts.append((len(self.chunks), start))
+                self.chunks.append(arrays)
+        if not starts:
+            raise ValueError(f"No sequences of length {seq_len} found in {paths}")
+        self.sequences = np.array(starts, dtype=np.int64)
+        self.fields = {key: (array.shape[1:], array.dtype) for key, array in self.chunks[0].items()}
+
+    @staticmethod
+    def _find_datasets(paths):
+        found = []
+        for path in paths:
+            for root, _, files in os.walk(path):
+                if INDEX_FILE in files: found.append(root)
+        return sorted(found)
+
+    def __len__(self):
+        """Batches per epoch."""
+        return len(self.sequences) // self.batch_size
+
+    def _load_batch(self, sequence_ids):
+        batch = {key: np.empty((len(sequence_ids), self.seq_len, *shape), dtype=dtype)
+                 for key, (shape, dtype) in self.fields.items()}
+        for i, (chunk_id, start) in enumerate(self.sequences[sequence_ids]):
+            chunk = self.chunks[chunk_id]
+            for key, out in batch.items():
+                out[i] = chunk[key][start:start + self.seq_len]
+        episode_start = np.empty((len(sequence_ids), self.seq_len), dtype=bool)
+        episode_start[:, 0] = True
+        episode_start[:, 1:] = batch['done'][:, :-1]
+        batch['episode_start'] = episode_start
+        return batch
+
+    def __iter__(self):
+        """One epoch of batches, assembled by background threads."""
+        order = self.rng.permutation(len(self.sequences)) if self.shuffle else np.arange(len(self.sequences))
+        batches = [order[batch_idx * self.batch_size:(batch_idx + 1) * self.batch_size] for batch_idx in range(len(self))]
+        if not self.num_workers:
+            for sequence_ids in batches:
+                yield self._load_batch(sequence_ids)
+            return
+
+        work = queue.Queue()
+        for batch_idx, sequence_ids in enumerate(batches):
+            work.put((batch_idx, sequence_ids))
+        ready = {}
+        condition = threading.Condition()
+        stop = threading.Event()
+
+        def worker():
+            while not stop.is_set():
+                try:
+                    batch_idx, sequence_ids = work.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    batch = self._load_batch(sequence_ids)
+                except Exception as error:
+                    batch = error # Handed to the consumer, which raises it in its own thread
+                with condition:
+                    # Bounded read-ahead: wait until the consumer is close enough
+                    condition.wait_for(lambda: stop.is_set() or batch_idx < next_batch[0] + self.prefetch)
+                    ready[batch_idx] = batch
+                    condition.notify_all()
+
+        next_batch = [0]
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.num_workers)]
+        for thread in threads: thread.start()
+        try:
+            for batch_idx in range(len(self)):
+                with condition:
+                    condition.wait_for(lambda: batch_idx in ready)
+                    batch = ready.pop(batch_idx)
+                    next_batch[0] = batch_idx + 1
+                    condition.notify_all()
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            stop.set()
+            with condition:
+                condition.notify_all()
+            for thread in threads: thread.join()
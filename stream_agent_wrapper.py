@@ -1,58 +1,209 @@
 import asyncio
-import websockets
 import json
+import queue
+import sys
+import threading
+import time
+import websockets
 
 import gymnasium as gym
+import numpy as np
+
+DEFAULT_WS_ADDRESS = "wss://transdimensional.xyz/broadcast"
+
+class WebSocketSink:
+    """Sends messages to a websocket endpoint, reconnecting with exponential backoff."""
+    def __init__(self, address, timeout=5.0, min_backoff=1.0, max_backoff=60.0):
+        self.address = address
+        self.timeout = timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.backoff = min_backoff
+        self.next_attempt = 0.0
+        self.loop = asyncio.new_event_loop() # Owned by the sender thread
+        self.websocket = None
+
+    def send(self, message):
+        # Returns False when the message could not be delivered (caller counts it as dropped)
+        if self.websocket is None:
+            if time.monotonic() < self.next_attempt:
+                return False
+            self.loop.run_until_complete(self.establish_wc_connection())
+            if self.websocket is None:
+                self.next_attempt = time.monotonic() + self.backoff
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+                return False
+            self.backoff = self.min_backoff
+        return self.loop.run_until_complete(self.broadcast_ws_message(message))
+
+    async def broadcast_ws_message(self, message):
+        try:
+            await asyncio.wait_for(self.websocket.send(message), self.timeout)
+            return True
+        except (websockets.exceptions.WebSocketException, OSError, asyncio.TimeoutError):
+            self.websocket = None
+            return False
+
+    async def establish_wc_connection(self):
+        try:
+            self.websocket = await asyncio.wait_for(websockets.connect(self.address), self.timeout)
+        except Exception:
+            self.websocket = None
+
+    def close(self):
+        if self.websocket is not None:
+            self.loop.run_until_complete(self.websocket.close())
+        self.loop.close()
+
+class FileSink:
+    """Appends one JSON message per line to a local file (no network needed)."""
+    def __init__(self, path):
+        self.file = open(path, "a")
+
+    def send(self, message):
+        self.file.write(message + "\n")
+        self.file.flush()
+        return True
+
+    def close(self):
+        self.file.close()
+
+def make_sink(destination):
+    if destination.startswith(("ws://", "wss://")):
+        return WebSocketSink(destination)
+    if destination.startswith("file://"):
+        destination = destination[len("file://"):]
+    return FileSink(destination)
+
+class TelemetrySender(threading.Thread):
+    """
+    Background sender fed by a bounded queue, so env.step() never waits on the network.
+
+    Queued coordinate batches ((n, 3) arrays of x, y, map) are merged into one message
+    per send. When the queue is full the oldest batch is dropped; when it is more than
+    half full, consecutive repeated coordinates are collapsed before sending.
+    """
+    def __init__(self, destination, stream_metadata, max_queue=32):
+        super().__init__(daemon=True)
+        self.destination = destination
+        self.stream_metadata = stream_metadata
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.dropped = 0
+
+    def submit(self, coords):
+        while True:
+            try:
+                self.queue.put_nowait(coords)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    with self.lock:
+                        self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def stats(self):
+        with self.lock:
+            return {"sent": self.sent, "dropped": self.dropped, "queued": self.queue.qsize()}
+
+    def run(self):
+        sink = make_sink(self.destination) # Created here: the sink's event loop lives in this thread
+        try:
+            while not (self.stop_event.is_set() and self.queue.empty()):
+                try:
+                    batches = [self.queue.get(timeout=0.5)]
+                except queue.Empty:
+                    continue
+                while True:
+                    try:
+                        batches.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                coords = np.concatenate(batches)
+                if self.queue.qsize() > self.queue.maxsize // 2 and len(coords) > 1:
+                    keep = np.ones(len(coords), dtype=bool)
+                    keep[1:] = np.any(coords[1:] != coords[:-1], axis=1)
+                    coords = coords[keep]
+                message = json.dumps({"metadata": self.stream_metadata, "coords": coords.tolist()})
+
+                delivered = sink.send(message)
+                with self.lock:
+                    if delivered:
+                        self.sent += len(batches)
+                    else:
+                        self.dropped += len(batches)
+        finally:
+            sink.close()
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        self.join(timeout)
 
 class StreamWrapper(gym.Wrapper):
-    def __init__(self, env, stream_metadata={}):
+    def __init__(self, env, stream_metadata={}, destination=DEFAULT_WS_ADDRESS, max_queue=32):
         super().__init__(env)
-        self.ws_address = "wss://transdimensional.xyz/broadcast"
+        # destination: websocket URL (ws:// or wss://), or a local file path / file:// URL
+        self.ws_address = destination
         self.stream_metadata = stream_metadata
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
-        self.websocket = None
-        self.loop.run_until_complete(
-            self.establish_wc_connection()
-        )
+        self.sender = TelemetrySender(destination, stream_metadata, max_queue=max_queue)
+        self.sender.start()
         self.upload_interval = env.upload_interval
         self.steam_step_counter = 0
         self.env = env
-        self.coord_list = []
+        # Preallocated (x, y, map) rows instead of a growing list of tuples
+        self.coord_buffer = np.zeros((self.upload_interval + 1, 3), dtype=np.uint8)
+        self.coord_count = 0
 
     def step(self, action):
+        t0 = time.perf_counter()
         # print(f"wrapper: {self.env.coords}")
-        self.coord_list.append(self.env.coords)
+        self.coord_buffer[self.coord_count] = self.env.coords
+        self.coord_count += 1
 
         if self.steam_step_counter >= self.upload_interval:
-            self.loop.run_until_complete(
-                self.broadcast_ws_message(
-                    json.dumps(
-                        {
-                          "metadata": self.stream_metadata,
-                          "coords": self.coord_list
-                        }
-                    )
-                )
-            )
+            # Hand a copy of the batch to the sender thread, never blocks
+            self.sender.submit(self.coord_buffer[:self.coord_count].copy())
             self.steam_step_counter = 0
-            self.coord_list = []
+            self.coord_count = 0
 
         self.steam_step_counter += 1
 
-        return self.env.step(action) 
+        profiler = self.env.unwrapped.profiler
+        if profiler: profiler.add('stream', time.perf_counter() - t0)
+        return self.env.step(action)
 
-    async def broadcast_ws_message(self, message):
-        if self.websocket is None:
-            await self.establish_wc_connection()
-        if self.websocket is not None:
-            try:
-                await self.websocket.send(message)
-            except websockets.exceptions.WebSocketException as e:
-                self.websocket = None
+    @property
+    def stream_stats(self):
+        """Counters of sent, dropped and queued coordinate batches."""
+        return self.sender.stats()
 
-    async def establish_wc_connection(self):
-        try:
-            self.websocket = await websockets.connect(self.ws_address)
-        except:
-            self.websocket = None
+    def close(self):
+        self.sender.stop()
+        return super().close()
+
+def serve_local(port=8765, output_path=None):
+    """Minimal local broadcast server for testing: prints (or logs) every message received."""
+    async def handler(websocket):
+        async for message in websocket:
+            if output_path:
+                with open(output_path, "a") as f:
+                    f.write(message + "\n")
+            else:
+                print(message[:200])
+
+    async def main():
+        async with websockets.serve(handler, "localhost", port):
+            print(f"📡 Escuchando en ws://localhost:{port}")
+            await asyncio.Future()
+
+    asyncio.run(main())
+
+if __name__ == "__main__":
+    # python stream_agent_wrapper.py [port] [output_file]
+    serve_local(int(sys.argv[1]) if len(sys.argv) > 1 else 8765,
+                sys.argv[2] if len(sys.argv) > 2 else None)
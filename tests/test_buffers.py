@@ -0,0 +1,63 @@
+import numpy as np
+import torch as th
+from gymnasium import spaces
+from src.training.buffers import DedupRecurrentDictRolloutBuffer
+
+N_STEPS, N_ENVS = 8, 2
+HIDDEN_SHAPE = (N_STEPS, 1, N_ENVS, 4)
+
+def make_buffer():
+    observation_space = spaces.Dict({
+        'screen': spaces.Box(0, 255, (3, 6, 5), dtype=np.uint8),
+        'ram': spaces.Box(0, 1, (3,), dtype=np.float32),
+    })
+    buffer = DedupRecurrentDictRolloutBuffer(N_STEPS, observation_space, spaces.Discrete(4), HIDDEN_SHAPE,
+                                             'cpu', n_envs=N_ENVS)
+    buffer.reset()
+    return buffer
+
+def fill(buffer, screens):
+    zeros = np.zeros(N_ENVS, dtype=np.float32)
+    states = th.zeros(HIDDEN_SHAPE[1:])
+    for step in range(N_STEPS):
+        # The RAM vector tags each row with its (step, env), to check samples against
+        ram = np.array([[step, env, 0] for env in range(N_ENVS)], dtype=np.float32)
+        obs = {'screen': screens[step], 'ram': ram}
+        buffer.add(obs, np.zeros((N_ENVS, 1)), zeros, np.zeros(N_ENVS, dtype=bool), th.zeros(N_ENVS),
+                   th.zeros(N_ENVS), lstm_states=_LstmStates((states, states), (states, states)))
+    buffer.compute_returns_and_advantage(th.zeros(N_ENVS), np.zeros(N_ENVS, dtype=bool))
+
+class _LstmStates:
+    def __init__(self, pi, vf):
+        self.pi, self.vf = pi, vf
+
+def test_repeated_frames_are_stored_once():
+    rng = np.random.default_rng(0)
+    distinct = rng.integers(0, 256, size=(3, 3, 6, 5), dtype=np.uint8)
+    screens = distinct[rng.integers(0, 3, size=(N_STEPS, N_ENVS))]
+    buffer = make_buffer()
+    fill(buffer, screens)
+    assert buffer.num_frames['screen'] == len(np.unique(screens.reshape(N_STEPS * N_ENVS, -1), axis=0))
+
+def test_samples_round_trip_the_original_frames():
+    rng = np.random.default_rng(1)
+    distinct = rng.integers(0, 256, size=(4, 3, 6, 5), dtype=np.uint8)
+    screens = distinct[rng.integers(0, 4, size=(N_STEPS, N_ENVS))]
+    buffer = make_buffer()
+    fill(buffer, screens)
+    for samples in buffer.get(batch_size=N_STEPS * N_ENVS):
+        valid = samples.mask.numpy().astype(bool) # Sequences are padded to equal length
+        sampled = samples.observations['screen'].numpy()[valid].astype(np.uint8)
+        tags = samples.observations['ram'].numpy()[valid, :2].astype(int)
+        assert len(sampled) == N_STEPS * N_ENVS
+        for screen, (step, env) in zip(sampled, tags):
+            assert np.array_equal(screen, screens[step, env])
+
+def test_colliding_frames_stay_findable(monkeypatch):
+    buffer = make_buffer()
+    monkeypatch.setattr('src.training.buffers.zlib.crc32', lambda frame: 0) # Every frame collides
+    a = np.zeros((3, 6, 5), dtype=np.uint8)
+    b = np.ones((3, 6, 5), dtype=np.uint8)
+    ids = [buffer._store_frame('screen', frame) for frame in (a, b, b, a, b)]
+    assert ids == [0, 1, 1, 0, 1]
+    assert buffer.num_frames['screen'] == 2
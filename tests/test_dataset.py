@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from gymnasium import spaces
+from src.environment.pokemon_env import PokemonYellowEnv
+from src.training.dataset import DatasetRecorder, SequenceDataset, TrajectoryDatasetWriter
+
+def record(directory, steps, chunk_steps=32, seed=0):
+    env = DatasetRecorder(PokemonYellowEnv("roms/missing.gb", backend='fake', screen_resolution=(36, 40),
+                                           state_path="states/missing.state", profile_interval=0),
+                          directory, chunk_steps=chunk_steps)
+    rng = np.random.default_rng(seed)
+    obs, _ = env.reset(seed=seed)
+    expected = []
+    for _ in range(steps):
+        action = int(rng.integers(env.action_space.n))
+        next_obs, reward, terminated, truncated, _ = env.step(action)
+        expected.append((np.array(obs['screen']), obs['ram'].copy(), action, reward))
+        obs = next_obs
+    env.close()
+    return expected
+
+def test_recorded_rows_round_trip(tmp_path):
+    expected = record(str(tmp_path), steps=64)
+    dataset = SequenceDataset(str(tmp_path), seq_len=16, batch_size=1, shuffle=False, num_workers=0)
+    rows = [batch for batch in dataset]
+    assert len(rows) == 4
+    for i, batch in enumerate(rows):
+        for t in range(16):
+            screen, ram, action, reward = expected[16 * i + t]
+            assert np.array_equal(batch['screen'][0, t], screen) # s_t is paired with a_t
+            assert np.allclose(batch['ram'][0, t], ram)
+            assert batch['action'][0, t] == action
+            assert batch['reward'][0, t] == pytest.approx(reward)
+        assert batch['episode_start'][0, 0]
+
+def test_partial_chunk_is_kept_on_close(tmp_path):
+    record(str(tmp_path), steps=40, chunk_steps=32)
+    dataset = SequenceDataset(str(tmp_path), seq_len=8, batch_size=1, num_workers=0)
+    assert len(dataset) == 5 # 32 + 8 rows
+
+def make_dataset(directory, steps=48):
+    writer = TrajectoryDatasetWriter(directory, spaces.Dict({'ram': spaces.Box(0, 1, (2,), np.float32)}),
+                                     chunk_steps=16)
+    for step in range(steps):
+        writer.append({'ram': np.full(2, step, dtype=np.float32)}, step, 0.0, step % 10 == 9)
+    writer.close()
+
+def test_episode_start_follows_done(tmp_path):
+    make_dataset(str(tmp_path))
+    dataset = SequenceDataset(str(tmp_path), seq_len=16, batch_size=3, shuffle=False, num_workers=0)
+    batch = next(iter(dataset))
+    actions = batch['action'].reshape(-1)
+    starts = batch['episode_start'].reshape(-1)
+    for action, start in zip(actions, starts):
+        assert start == (action % 16 == 0 or action % 10 == 0)
+
+@pytest.mark.parametrize('num_workers', [0, 1, 3])
+def test_workers_yield_every_batch_in_order(tmp_path, num_workers):
+    make_dataset(str(tmp_path))
+    dataset = SequenceDataset(str(tmp_path), seq_len=4, batch_size=2, shuffle=False, num_workers=num_workers,
+                              prefetch=1)
+    actions = [batch['action'][:, 0].tolist() for batch in dataset]
+    assert actions == [[8 * i, 8 * i + 4] for i in range(6)]
+
+def test_worker_errors_reach_the_consumer(tmp_path):
+    make_dataset(str(tmp_path))
+    dataset = SequenceDataset(str(tmp_path), seq_len=4, batch_size=2, num_workers=2)
+    def fail(sequence_ids):
+        raise OSError("chunk unreadable")
+    dataset._load_batch = fail
+    with pytest.raises(OSError, match="chunk unreadable"):
+        list(dataset)
+
+def test_invalid_prefetch_is_rejected(tmp_path):
+    make_dataset(str(tmp_path))
+    with pytest.raises(ValueError):
+        SequenceDataset(str(tmp_path), seq_len=4, num_workers=2, prefetch=0)
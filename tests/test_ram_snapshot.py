@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from src.environment.fake_pyboy import MEM_EVENT_FLAGS_START, MEM_MAP_ID, MEM_X_COORD, FakePyBoy
+from src.environment.ram_snapshot import RamSnapshot
+
+def test_overlapping_and_touching_regions_are_merged():
+    ram = RamSnapshot([(0xD100, 0xD110), (0xD108, 0xD120), (0xD120, 0xD124), (0xD200, 0xD204)])
+    assert [(start, end) for start, end, _ in ram.layout] == [(0xD100, 0xD124), (0xD200, 0xD204)]
+    assert len(ram.buffer) == 0x24 + 4
+
+def test_reads_match_memory():
+    memory = np.random.default_rng(0).integers(0, 256, size=0x10000, dtype=np.uint8)
+    ram = RamSnapshot([(0xD100, 0xD110), (0xD200, 0xD208)])
+    ram.refresh(memory)
+    assert ram.byte(0xD105) == memory[0xD105]
+    assert ram.word(0xD200) == (int(memory[0xD200]) << 8) + int(memory[0xD201])
+    assert np.array_equal(ram.view(0xD202, 0xD208), memory[0xD202:0xD208])
+    expected = sum(bin(int(value)).count('1') for value in memory[0xD100:0xD110])
+    assert ram.popcount(0xD100, 0xD110) == expected
+
+def test_event_flags_match_the_fake_backend():
+    pyboy = FakePyBoy()
+    rng = np.random.default_rng(0)
+    for button in rng.choice(['a', 'a', 'left', 'right', 'up', 'down'], size=3000):
+        pyboy.button(button)
+        pyboy.tick(24)
+    flags = bytes(pyboy.memory.data[MEM_EVENT_FLAGS_START:MEM_EVENT_FLAGS_START + 320])
+    expected = sum(bin(value).count('1') for value in flags)
+    assert expected > 0
+    ram = RamSnapshot([(MEM_MAP_ID, MEM_X_COORD + 1), (MEM_EVENT_FLAGS_START, MEM_EVENT_FLAGS_START + 320)])
+    ram.refresh(pyboy.memory)
+    assert ram.popcount(MEM_EVENT_FLAGS_START, MEM_EVENT_FLAGS_START + 320) == expected
+    assert ram.byte(MEM_MAP_ID) == pyboy.memory[MEM_MAP_ID]
+
+def test_uncovered_reads_raise():
+    ram = RamSnapshot([(0xD100, 0xD110), (0xD110, 0xD112), (0xD200, 0xD208)])
+    with pytest.raises(KeyError):
+        ram.byte(0xD150)
+    with pytest.raises(KeyError):
+        ram.view(0xD10C, 0xD204) # Runs past its region into the next one
+    with pytest.raises(KeyError):
+        ram.popcount(0xD204, 0xD20C) # Past the end of the last region
+    assert len(ram.view(0xD10C, 0xD112)) == 6 # Touching ranges were merged into one region
@@ -0,0 +1,82 @@
+import io
+import os
+import numpy as np
+from src.environment.fake_pyboy import FakePyBoy
+from src.environment.state_archive import StateArchive, prune_archive
+
+def fake_state(steps):
+    """A real FakePyBoy savestate after `steps` presses (compressible, like PyBoy's)."""
+    pyboy = FakePyBoy()
+    for i in range(steps):
+        pyboy.button(('a', 'right', 'down')[i % 3])
+        pyboy.tick(24, render=False)
+    buffer = io.BytesIO()
+    pyboy.save_state(buffer)
+    return buffer.getvalue()
+
+def test_add_keeps_the_best_entry_per_frontier():
+    archive = StateArchive()
+    assert archive.add(fake_state(10), map_id=1, event_count=2, dex_count=0)
+    assert not archive.add(fake_state(11), map_id=1, event_count=2, dex_count=0)
+    assert archive.add(fake_state(12), map_id=1, event_count=2, dex_count=1) # Better dex count replaces it
+    assert len(archive) == 1
+    assert archive.has(1, 2, 1) and not archive.has(1, 2, 2)
+
+def test_sample_round_trips_the_state():
+    state = fake_state(50)
+    archive = StateArchive()
+    archive.add(state, map_id=3, event_count=1, dex_count=0)
+    restored = archive.sample(np.random.default_rng(0))
+    assert restored == state
+    pyboy = FakePyBoy()
+    pyboy.load_state(io.BytesIO(restored))
+    assert pyboy.frame_count == 50 * 24
+
+def test_eviction_drops_the_least_advanced_entries():
+    archive = StateArchive()
+    for events in range(5):
+        archive.add(fake_state(events), map_id=0, event_count=events, dex_count=0)
+    archive.max_bytes = archive.total_bytes - 1
+    archive._evict()
+    assert (0, 0) not in archive.entries and (0, 4) in archive.entries
+    assert archive.has(0, 0) # Remembered, so the frontier is not captured again
+
+def test_workers_share_states_and_only_the_writer_deletes(tmp_path):
+    writer = StateArchive(str(tmp_path))
+    reader = StateArchive(str(tmp_path))
+    for events in range(4):
+        writer.add(fake_state(events), map_id=0, event_count=events, dex_count=0)
+    reader.sync()
+    assert len(reader) == 4
+
+    # The reader evicting its copy leaves the writer's files alone, and does not reload them
+    reader.max_bytes = len(reader.entries[(0, 3)]['state'])
+    reader._evict()
+    assert len(os.listdir(tmp_path)) == 4
+    reader.sync()
+    assert len(reader) == 1
+
+    writer.max_bytes = 0
+    writer._evict()
+    assert len(writer) == 1 and len(os.listdir(tmp_path)) == 1
+
+def test_sample_favours_advanced_entries():
+    archive = StateArchive()
+    for events in (0, 20):
+        archive.add(fake_state(events), map_id=0, event_count=events, dex_count=0)
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        archive.sample(rng)
+    assert archive.entries[(0, 20)]['samples'] > archive.entries[(0, 0)]['samples']
+
+def test_prune_keeps_the_best_files_within_budget(tmp_path):
+    archive = StateArchive(str(tmp_path))
+    for events in range(4):
+        archive.add(fake_state(events), map_id=0, event_count=events, dex_count=0)
+    archive.add(fake_state(9), map_id=0, event_count=3, dex_count=2) # Supersedes e3/d0 (left on disk by a crash)
+    with open(os.path.join(tmp_path, "m000_e0003_d000.state.z"), "wb") as f:
+        f.write(b"stale")
+    newest = os.path.getsize(os.path.join(tmp_path, "m000_e0003_d002.state.z"))
+    removed = prune_archive(str(tmp_path), max_bytes=newest)
+    assert removed == 4
+    assert os.listdir(tmp_path) == ["m000_e0003_d002.state.z"]
@@ -0,0 +1,149 @@
+import os
+import queue
+import time
+from collections import deque
+import numpy as np
+import torch.multiprocessing as mp
+from sb3_contrib import RecurrentPPO
+from stable_baselines3.common.logger import configure
+from src.environment.pokemon_env import PokemonYellowEnv
+from src.environment.state_archive import prune_archive
+from src.training.actor_learner import PolicyWeights, collate, learner_update, run_actor
+from src.training.checkpoints import AsyncCheckpointer
+
+# --- CONFIGURATION ---
+# Actor–learner mode: actor processes keep the emulators stepping all the time with a CPU
+# copy of the policy, the learner trains on their chunks as they arrive (V-trace corrected).
+ROM_PATH = "roms/PokemonYellow.gb"
+SESSION_NAME = "poke_lstm_actor_learner"
+CHECKPOINT_DIR = f"experiments/{SESSION_NAME}/models"
+LOG_DIR = f"experiments/{SESSION_NAME}/logs"
+FINAL_MODEL_PATH = f"{CHECKPOINT_DIR}/final_model"
+TOTAL_TIMESTEPS = 10000000
+NUM_ACTORS = 6
+ENVS_PER_ACTOR = 2 # Batched policy forward per actor
+CHUNK_LEN = 64 # Steps per sequence chunk sent to the learner
+CHUNKS_PER_BATCH = 4 # Actor messages per learner update
+QUEUE_SIZE = 16 # Chunks in flight; actors block when the learner falls this far behind
+LOG_INTERVAL = 10 # Learner updates between TensorBoard dumps
+SAVE_INTERVAL = 500 # Learner updates between checkpoints
+BACKEND = "pyboy" # 'fake' = run the whole pipeline without the ROM
+
+# Same env and policy settings as train_lstm.py (checkpoints load with RecurrentPPO.load / play.py)
+ENV_KWARGS = dict(render_mode='rgb_array', screen_resolution=(144, 160), grayscale=False, frame_stack=1,
+                  emulation_profile="fast", frames_per_action=24, frames_to_hold=1, fast_forward=False,
+                  watchdog_windows={'events': 8192, 'maps': 4096, 'dex': 8192, 'tiles': 1024},
+                  archive_dir=None, archive_reset_prob=0.0, backend=BACKEND)
+LEARNING_RATE = 0.00025
+GAMMA = 0.998
+ENT_COEF = 0.02
+VF_COEF = 0.5
+MAX_GRAD_NORM = 0.5
+POLICY_KWARGS = dict(enable_critic_lstm=False, lstm_hidden_size=256)
+
+def make_env():
+    return PokemonYellowEnv(ROM_PATH, **ENV_KWARGS)
+
+if __name__ == "__main__":
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    ctx = mp.get_context("spawn")
+    if ENV_KWARGS['archive_dir']:
+        # Shared archive dir: trim what earlier runs left before the actors start
+        prune_archive(ENV_KWARGS['archive_dir'], ENV_KWARGS.get('archive_max_mb', 64) * 1024 * 1024)
+
+    # 1. Learner model (one env only to read the spaces; the actors own the real ones)
+    spaces_env = make_env()
+    if os.path.exists(f"{FINAL_MODEL_PATH}.zip"):
+        print(f"--- REANUDANDO ENTRENAMIENTO: Cargando {FINAL_MODEL_PATH} ---")
+        model = RecurrentPPO.load(FINAL_MODEL_PATH, env=spaces_env, device="auto")
+    else:
+        print(f"--- INICIANDO ENTRENAMIENTO DESDE CERO: {SESSION_NAME} ---")
+        model = RecurrentPPO("MultiInputLstmPolicy", spaces_env, learning_rate=LEARNING_RATE, gamma=GAMMA,
+                             ent_coef=ENT_COEF, vf_coef=VF_COEF, max_grad_norm=MAX_GRAD_NORM,
+                             policy_kwargs=POLICY_KWARGS, device="auto")
+    spaces_env.close()
+    model.set_logger(configure(LOG_DIR, ["stdout", "tensorboard"]))
+    model.ep_info_buffer = deque(maxlen=100)
+    policy = model.policy
+    policy.set_training_mode(True)
+
+    # 2. Shared weights + chunk queue, then the actors
+    weights = PolicyWeights(policy, ctx)
+    learner_version = weights.publish(policy)
+    chunk_queue = ctx.Queue(maxsize=QUEUE_SIZE)
+    stop_event = ctx.Event()
+    actors = [ctx.Process(target=run_actor, daemon=True,
+                          args=(i, make_env, ENVS_PER_ACTOR, type(policy), POLICY_KWARGS,
+                                weights, chunk_queue, CHUNK_LEN, GAMMA, stop_event, 1000 * i))
+              for i in range(NUM_ACTORS)]
+    for actor in actors: actor.start()
+    checkpointer = AsyncCheckpointer(CHECKPOINT_DIR, "actor_learner_model", keep_last=3, keep_best=1)
+
+    # 3. Learner loop
+    updates = 0
+    window = {'steps': 0, 'lags': [], 'busy': 0.0, 'blocked': 0.0, 'wait': 0.0, 'train': 0.0, 'stats': []}
+    window_start = time.perf_counter()
+    try:
+        while model.num_timesteps < TOTAL_TIMESTEPS:
+            t0 = time.perf_counter()
+            chunks = []
+            while len(chunks) < CHUNKS_PER_BATCH:
+                try:
+                    chunks.append(chunk_queue.get(timeout=5.0))
+                except queue.Empty:
+                    if not any(actor.is_alive() for actor in actors):
+                        raise RuntimeError("Todos los actores terminaron")
+            t1 = time.perf_counter()
+
+            for chunk in chunks:
+                steps = chunk['actions'].size
+                model.num_timesteps += steps
+                window['steps'] += steps
+                window['lags'].append(learner_version - chunk['version'])
+                window['busy'] += chunk['busy_time']
+                window['blocked'] += chunk['blocked_time']
+                model.ep_info_buffer.extend(chunk['episodes'])
+
+            stats = learner_update(policy, collate(chunks, model.device), GAMMA, ENT_COEF, VF_COEF, MAX_GRAD_NORM)
+            learner_version = weights.publish(policy)
+            updates += 1
+            window['stats'].append(stats)
+            window['wait'] += t1 - t0
+            window['train'] += time.perf_counter() - t1
+
+            if updates % LOG_INTERVAL == 0:
+                elapsed = time.perf_counter() - window_start
+                logger = model.logger
+                logger.record('actor_learner/env_steps_per_sec', window['steps'] / elapsed)
+                logger.record('actor_learner/version_lag_mean', float(np.mean(window['lags'])))
+                logger.record('actor_learner/version_lag_max', int(np.max(window['lags'])))
+                # Share of actor time spent stepping (1.0 = emulators never wait on the learner)
+                logger.record('actor_learner/actor_busy', window['busy'] / max(window['busy'] + window['blocked'], 1e-9))
+                logger.record('actor_learner/learner_wait_share', window['wait'] / elapsed)
+                logger.record('actor_learner/learner_train_share', window['train'] / elapsed)
+                logger.record('actor_learner/queue_size', chunk_queue.qsize())
+                for key in window['stats'][0]:
+                    logger.record(f'train/{key}', float(np.mean([s[key] for s in window['stats']])))
+                if model.ep_info_buffer:
+                    logger.record('rollout/ep_rew_mean', float(np.mean([ep['r'] for ep in model.ep_info_buffer])))
+                    logger.record('rollout/ep_len_mean', float(np.mean([ep['l'] for ep in model.ep_info_buffer])))
+                logger.record('train/n_updates', updates)
+                logger.dump(model.num_timesteps)
+                window = {'steps': 0, 'lags': [], 'busy': 0.0, 'blocked': 0.0, 'wait': 0.0, 'train': 0.0, 'stats': []}
+                window_start = time.perf_counter()
+
+            if updates % SAVE_INTERVAL == 0:
+                checkpointer.save(model)
+    except KeyboardInterrupt:
+        print("\n--- Pausa detectada. Guardando progreso... ---")
+    finally:
+        stop_event.set()
+        checkpointer.save(model, path=f"{FINAL_MODEL_PATH}.zip", retain=False, wait=True)
+        checkpointer.close()
+        # Drain so actors blocked on put() can exit
+        while any(actor.is_alive() for actor in actors):
+            try:
+                chunk_queue.get(timeout=0.5)
+            except queue.Empty:
+                pass
+        print(f"✅ Proceso guardado en: {FINAL_MODEL_PATH}")
@@ -1,90 +1,235 @@
 from sb3_contrib import RecurrentPPO
 from stable_baselines3.common.env_util import make_vec_env
-from stable_baselines3.common.vec_env import SubprocVecEnv
-from stable_baselines3.common.callbacks import CheckpointCallback
+from stable_baselines3.common.callbacks import CallbackList
 from src.environment.pokemon_env import PokemonYellowEnv
+from src.environment.shared_vec_env import SharedMemoryVecEnv
+from src.environment.state_archive import prune_archive
+from src.training.buffers import use_dedup_buffer
+from src.training.dataset import DatasetRecorder
+from src.training.callbacks import (AsyncCheckpointCallback, EpisodeMetricsCallback, RolloutMemoryCallback,
+                                    ThroughputCallback)
+import argparse
+import json
 import os
-from stream_agent_wrapper import StreamWrapper
+import torch
+from stream_agent_wrapper import DEFAULT_WS_ADDRESS, StreamWrapper
 import uuid
 
 # --- CONFIGURATION ---
+# Defaults for a single run. `--config run.json` overrides any of them per run (see scheduler.py).
 ROM_PATH = "roms/PokemonYellow.gb"
 SESSION_NAME = "poke_lstm_v1"
-CHECKPOINT_DIR = f"experiments/{SESSION_NAME}/models"
-LOG_DIR = f"experiments/{SESSION_NAME}/logs"
+EXPERIMENTS_DIR = "experiments" # Each run lives in experiments/<session>/
 TOTAL_TIMESTEPS = 10000000 
 NUM_CPU = 6 
-FINAL_MODEL_PATH = f"{CHECKPOINT_DIR}/final_model_optimized"
+# Emulators hosted by each worker process (observations go through shared memory, not pipes)
+ENVS_PER_WORKER = 1
+# Core ids this run may use: the learner takes the first, env workers are pinned one per core
+# to the rest. None = no pinning (the OS schedules everything).
+CORES = None
+# Where the coordinate stream goes: websocket URL, or a local file path to run without network
+STREAM_DESTINATION = DEFAULT_WS_ADDRESS
 
-# Save every 20 network updates
-SAVE_FREQ = (2048 * NUM_CPU * 20) // NUM_CPU 
+# Screen pipeline: (72, 80) or (36, 40) + grayscale cuts CPU, IPC and rollout memory.
+# Changing these changes the observation space, so start a new SESSION_NAME.
+SCREEN_RESOLUTION = (144, 160)
+GRAYSCALE = False
+FRAME_STACK = 1
+# 'multi' = screen + RAM vector (screen re-read every SCREEN_INTERVAL steps, held in between)
+# 'ram' = no screen, symbolic RAM vector only (position, party, battle, event flags, dex)
+OBSERVATION_TYPE = "multi"
+SCREEN_INTERVAL = 1
 
-os.makedirs(CHECKPOINT_DIR, exist_ok=True)
-os.makedirs(LOG_DIR, exist_ok=True)
+# Emulation: 'fast' skips sound and renders only the frame the agent sees ('legacy' = old behaviour)
+EMULATION_PROFILE = "fast"
+FRAMES_PER_ACTION = 24
+FRAMES_TO_HOLD = 1
+# Advance text boxes and scripted sequences inside the env (no policy call); skipped frames in info.
+# Changes the MDP (fewer decisions, different reward timing): enable it per session in the run config.
+FAST_FORWARD_DIALOGUE = False
+
+# Profiling: per-phase step timings every PROFILE_INTERVAL steps (logged under perf/ in TensorBoard).
+# Set SAMPLING_PROFILE_DIR to dump a sampled profile (folded stacks) per worker.
+PROFILE_INTERVAL = 1000
+SAMPLING_PROFILE_DIR = None
+
+# Stagnation watchdog: truncate once no signal showed novelty within its window (steps).
+# Set to None to always run the full max_steps.
+WATCHDOG_WINDOWS = {'events': 8192, 'maps': 4096, 'dex': 8192, 'tiles': 1024}
+
+# Savestate archive: progress frontiers shared by all workers (and across restarts) through this dir.
+# A fraction of episodes starts from an archived state instead of states/start.state.
+# Changes the start distribution: enable it per session (e.g. "archive_dir": "archive",
+# "archive_reset_prob": 0.5 in env_kwargs). Every worker keeps up to ARCHIVE_MAX_MB in RAM.
+ARCHIVE_DIR = None # Relative to experiments/<session>/, None disables it
+ARCHIVE_RESET_PROB = 0.0
+ARCHIVE_MAX_MB = 64
+
+# Trajectory recording: per episode actions, reward components and a savestate every
+# RECORD_KEYFRAME_INTERVAL steps (a few KB per thousand steps). Replay with replay.py.
+# Each env keeps only its newest RECORD_KEEP_LAST episodes on disk (None = keep all).
+RECORD_DIR = None # Relative to experiments/<session>/ (e.g. "trajectories"), None disables it
+RECORD_KEYFRAME_INTERVAL = 2048
+RECORD_KEEP_LAST = 100
+
+# Offline dataset: every transition (observations, action, reward, done) streamed to chunked
+# .npy files for pretraining with SequenceDataset. Full observations, so ~60 KB per step at
+# 144x160 RGB: enable it for collection runs only.
+DATASET_DIR = None # Relative to experiments/<session>/, None disables it
+DATASET_CHUNK_STEPS = 8192
+
+# Rollout buffer: store each distinct screen once (menus, text boxes and walls repeat a lot).
+# Memory use is logged under memory/ in TensorBoard.
+DEDUP_FRAMES = True
+
+# Save every SAVE_EVERY_UPDATES network updates (callback steps, i.e. n_steps per update)
+SAVE_EVERY_UPDATES = 20
+# Checkpoints are written in the background; only the newest KEEP_LAST and the KEEP_BEST
+# by mean episode reward are kept. models/latest.json always names the newest one.
+KEEP_LAST_CHECKPOINTS = 3
+KEEP_BEST_CHECKPOINTS = 1
+
+def default_config():
+    """The constants above as a run config (what `--config` files override)."""
+    return {
+        'session_name': SESSION_NAME,
+        'total_timesteps': TOTAL_TIMESTEPS,
+        'num_cpu': NUM_CPU,
+        'envs_per_worker': ENVS_PER_WORKER,
+        'cores': CORES,
+        'stream_destination': STREAM_DESTINATION,
+        'progress_bar': True,
+        'dataset_dir': DATASET_DIR,
+        'dataset_chunk_steps': DATASET_CHUNK_STEPS,
+        'env_kwargs': dict(screen_resolution=SCREEN_RESOLUTION, grayscale=GRAYSCALE, frame_stack=FRAME_STACK,
+                           observation_type=OBSERVATION_TYPE, screen_interval=SCREEN_INTERVAL,
+                           emulation_profile=EMULATION_PROFILE, frames_per_action=FRAMES_PER_ACTION,
+                           frames_to_hold=FRAMES_TO_HOLD, fast_forward=FAST_FORWARD_DIALOGUE,
+                           profile_interval=PROFILE_INTERVAL, sampling_profile_dir=SAMPLING_PROFILE_DIR,
+                           archive_dir=ARCHIVE_DIR, archive_reset_prob=ARCHIVE_RESET_PROB,
+                           archive_max_mb=ARCHIVE_MAX_MB, watchdog_windows=WATCHDOG_WINDOWS,
+                           record_dir=RECORD_DIR, record_keyframe_interval=RECORD_KEYFRAME_INTERVAL,
+                           record_keep_last=RECORD_KEEP_LAST),
+        'model_kwargs': dict(learning_rate=0.00025, n_steps=2048, batch_size=1024, n_epochs=15,
+                             gamma=0.998, gae_lambda=0.95, clip_range=0.2, ent_coef=0.02,
+                             policy_kwargs=dict(enable_critic_lstm=False, lstm_hidden_size=256)),
+    }
+
+def load_config(path=None):
+    """Defaults overridden by a JSON run config; env_kwargs / model_kwargs are merged key by key."""
+    config = default_config()
+    if path is None: return config
+    with open(path) as f:
+        overrides = json.load(f)
+    for key, value in overrides.items():
+        if key in ('env_kwargs', 'model_kwargs'):
+            config[key].update(value)
+        else:
+            config[key] = value
+    if isinstance(config['env_kwargs']['screen_resolution'], list):
+        config['env_kwargs']['screen_resolution'] = tuple(config['env_kwargs']['screen_resolution'])
+    return config
+
+def pin_cores(cores):
+    """Pins this process to its first core; returns the cores left for the env workers."""
+    if not cores or not hasattr(os, "sched_setaffinity"):
+        return None
+    os.sched_setaffinity(0, {cores[0]})
+    torch.set_num_threads(1)
+    return cores[1:] or cores[:1]
+
+def main(config):
+    session_dir = os.path.join(EXPERIMENTS_DIR, config['session_name'])
+    checkpoint_dir = f"{session_dir}/models"
+    log_dir = f"{session_dir}/logs"
+    final_model_path = f"{checkpoint_dir}/final_model_optimized"
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    os.makedirs(log_dir, exist_ok=True)
+
+    env_kwargs = dict(config['env_kwargs'])
+    for key in ('archive_dir', 'record_dir'):
+        if env_kwargs.get(key): env_kwargs[key] = os.path.join(session_dir, env_kwargs[key])
+    if env_kwargs.get('archive_dir'):
+        # This process owns the shared archive dir: trim what earlier runs left before workers start
+        prune_archive(env_kwargs['archive_dir'], env_kwargs['archive_max_mb'] * 1024 * 1024)
+    dataset_dir = os.path.join(session_dir, config['dataset_dir']) if config['dataset_dir'] else None
+    dataset_chunk_steps = config['dataset_chunk_steps']
+    worker_cores = pin_cores(config['cores'])
+    stream_destination = config['stream_destination']
+
+    def make_env():
+        env = StreamWrapper(PokemonYellowEnv(ROM_PATH, render_mode='rgb_array', **env_kwargs), 
+                            stream_metadata={"user": "Pokemon_Yellow\n",
+                                            "env_id": uuid.uuid4().hex[:8],
+                                            "color": "#a200ff", # 
+                                            "extra": ""},
+                            destination=stream_destination)
+        if dataset_dir:
+            env = DatasetRecorder(env, dataset_dir, chunk_steps=dataset_chunk_steps)
+        return env
 
-if __name__ == "__main__":
     # 1. Create Vectorized Environment
     env = make_vec_env(
-        lambda: StreamWrapper(PokemonYellowEnv(ROM_PATH, render_mode='rgb_array'), 
-                              stream_metadata={"user": "Pokemon_Yellow\n",
-                                              "env_id": uuid.uuid4().hex[:8],
-                                              "color": "#a200ff", # 
-                                              "extra": ""}),
-        n_envs=NUM_CPU,
-        vec_env_cls=SubprocVecEnv
+        make_env,
+        n_envs=config['num_cpu'],
+        vec_env_cls=SharedMemoryVecEnv,
+        vec_env_kwargs={"envs_per_worker": config['envs_per_worker'], "worker_cores": worker_cores}
     )
 
-    # 2. Callback for periodic saving
-    checkpoint_callback = CheckpointCallback(
-        save_freq=SAVE_FREQ,
-        save_path=CHECKPOINT_DIR,
-        name_prefix="lstm_model_optimized"
+    # 2. Callback for periodic saving (snapshot in memory, zip written by a background thread)
+    checkpoint_callback = AsyncCheckpointCallback(
+        save_freq=config['model_kwargs']['n_steps'] * SAVE_EVERY_UPDATES,
+        save_path=checkpoint_dir,
+        name_prefix="lstm_model_optimized",
+        keep_last=KEEP_LAST_CHECKPOINTS,
+        keep_best=KEEP_BEST_CHECKPOINTS
     )
 
     # 3. Model Loading or Creation Logic
     # Check if previous final model exists to resume
-    if os.path.exists(f"{FINAL_MODEL_PATH}.zip"):
-        print(f"--- REANUDANDO ENTRENAMIENTO: Cargando {FINAL_MODEL_PATH} ---")
+    if os.path.exists(f"{final_model_path}.zip"):
+        print(f"--- REANUDANDO ENTRENAMIENTO: Cargando {final_model_path} ---")
         model = RecurrentPPO.load(
-            FINAL_MODEL_PATH, 
+            final_model_path, 
             env=env, 
             device="auto", # Automatically detects your 6600 XT
-            tensorboard_log=LOG_DIR
+            tensorboard_log=log_dir
         )
     else:
-        print(f"--- INICIANDO ENTRENAMIENTO DESDE CERO: {SESSION_NAME} ---")
+        print(f"--- INICIANDO ENTRENAMIENTO DESDE CERO: {config['session_name']} ---")
         model = RecurrentPPO(
             "MultiInputLstmPolicy", 
             env, 
             verbose=1, 
-            tensorboard_log=LOG_DIR,
-            learning_rate=0.00025,
-            n_steps=2048,          
-            batch_size=1024,        
-            n_epochs=15,
-            gamma=0.998,           
-            gae_lambda=0.95,
-            clip_range=0.2,
-            ent_coef=0.02,         
-            policy_kwargs=dict(
-                enable_critic_lstm=False, 
-                lstm_hidden_size=256,
-            )
+            tensorboard_log=log_dir,
+            **config['model_kwargs']
         )
 
+    if DEDUP_FRAMES:
+        use_dedup_buffer(model)
+
     # 4. Training execution
     try:
         model.learn(
-            total_timesteps=TOTAL_TIMESTEPS, 
+            total_timesteps=config['total_timesteps'], 
             tb_log_name="LSTM_Optimized_Heavy_Batch",
-            callback=checkpoint_callback,
-            progress_bar=True,
+            callback=CallbackList([checkpoint_callback,
+                                   ThroughputCallback(status_path=f"{session_dir}/status.json"),
+                                   RolloutMemoryCallback(),
+                                   EpisodeMetricsCallback()]),
+            progress_bar=config['progress_bar'],
             reset_num_timesteps=False # Keeps global step count in TensorBoard
         )
     except KeyboardInterrupt:
         print("\n--- Pausa detectada. Guardando progreso... ---")
     finally:
-        # Safety save always on close
-        model.save(FINAL_MODEL_PATH)
+        # Safety save always on close: same snapshot path, waits for every pending write
+        checkpoint_callback.checkpointer.save(model, path=f"{final_model_path}.zip", retain=False, wait=True)
+        checkpoint_callback.checkpointer.close()
         env.close()
-        print(f"✅ Proceso guardado en: {FINAL_MODEL_PATH}")
\ No newline at end of file
+        print(f"✅ Proceso guardado en: {final_model_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the recurrent PPO agent")
+    parser.add_argument('--config', help="JSON run config overriding the defaults in this file")
+    main(load_config(parser.parse_args().config))
\ No newline at end of file